@@ -0,0 +1,66 @@
+'''
+Peak memory and time of the download exporters against pandas' own xlsx writer.
+
+Every format runs in a fresh process so peak RSS is not shared between rows.
+run with 'python benchmarks/bench_export.py [rows]' from the project directory
+'''
+import multiprocessing as mp
+import resource
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from stream import export
+
+ROWS = 1_000_000
+
+
+def make_frame(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'date': pd.date_range('2000-01-01', periods=rows, freq='min'),
+        'price': rng.standard_normal(rows).cumsum(),
+        'volume': rng.integers(0, 10_000, rows),
+        'ticker': rng.choice(['AAA', 'BBB', 'CCC', 'DDD'], rows),
+    })
+
+def pandas_xlsx(df):
+    '''The previous Pandas.to_excel path'''
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, sheet_name='Sheet1')
+    return output.getvalue()
+
+FORMATS = {
+    'pandas xlsx': pandas_xlsx,
+    'xlsx (constant_memory)': export.to_xlsx,
+    'parquet': export.to_parquet,
+    'csv.gz': export.to_csv_gz,
+}
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(fmt, rows, queue):
+    df = make_frame(rows)
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    data = FORMATS[fmt](df)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, max(peak_rss_mb() - before, 0), len(data) / 1e6))
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    ctx = mp.get_context('spawn')
+    print('{:<24} {:>10} {:>16} {:>10}'.format('format ({:,} rows)'.format(rows), 'time (s)', 'peak extra MB', 'file MB'))
+    for fmt in FORMATS:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run, args=(fmt, rows, queue))
+        proc.start()
+        elapsed, peak, size = queue.get()
+        proc.join()
+        print('{:<24} {:>10.2f} {:>16.1f} {:>10.1f}'.format(fmt, elapsed, peak, size))
@@ -0,0 +1,60 @@
+'''
+Cold import time of stream modules, measured with 'python -X importtime'.
+
+Every statement runs in a fresh interpreter so nothing is shared between rows.
+run with 'python benchmarks/bench_import.py' from the project directory
+'''
+import subprocess
+import sys
+
+STATEMENTS = {
+    'stream.core': 'import stream.core',
+    'stream.bases': 'import stream.bases',
+    'stream.bases.Pandas': 'from stream.bases import Pandas',
+    'stream.bases.StatsModels': 'from stream.bases import StatsModels',
+    'stream.bases.OLSPage': 'from stream.bases import OLSPage',
+    'stream.bases.Bt': 'from stream.bases import Bt',
+    'stream.bases.DataBase': 'from stream.bases import DataBase',
+}
+TOP_N = 5
+REPEATS = 3
+
+
+def parse_importtime(stderr):
+    '''Return [(cumulative microseconds, nesting depth, module)] for every import line'''
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line.split('|')
+        name = module.rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def measure(statement):
+    '''Total cumulative import time in seconds and the heaviest top level imports'''
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        return None, [proc.stderr.strip().splitlines()[-1]]
+
+    rows = parse_importtime(proc.stderr)
+    top_level = [(us, name) for us, depth, name in rows if depth == 0]
+    total = sum(us for us, _ in top_level) / 1e6
+    heaviest = sorted(top_level, reverse=True)[:TOP_N]
+    return total, ['{} ({:.3f}s)'.format(name, us / 1e6) for us, name in heaviest]
+
+
+if __name__ == '__main__':
+    for label, statement in STATEMENTS.items():
+        results = [measure(statement) for _ in range(REPEATS)]
+        totals = [t for t, _ in results if t is not None]
+        if not totals:
+            print('{:<26} failed: {}'.format(label, results[0][1][0]))
+            continue
+        print('{:<26} {:.3f}s  heaviest: {}'.format(label, min(totals), ', '.join(results[-1][1])))
@@ -0,0 +1,63 @@
+'''
+Rerun latency of Session.setup + Session.update as the data held in pages grows.
+
+run with 'python benchmarks/bench_session.py' from the project directory
+'''
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from stream.core import Session, Page
+
+N_PAGES = 10
+ROWS = [10_000, 100_000, 1_000_000]
+COLS = 10
+REPEATS = 5
+
+
+class DataPage(Page):
+
+    def __call__(self, **kwargs):
+        self.data['clicks'] = self.data.get('clicks', 0) + 1
+
+
+def build_session(name, rows, copy_on_write):
+    st.session_state.clear()
+    session = Session(name, start_page=DataPage('Home', 'home', data={}), copy_on_write=copy_on_write)
+    session.setup()
+    for i in range(N_PAGES):
+        page = DataPage('Page {}'.format(i), 'page_{}'.format(i), data={})
+        page.data['datasets'] = {'df': pd.DataFrame(np.random.randn(rows, COLS))}
+        session.add_node(page)
+    session.update()
+    return session
+
+
+def rerun(session):
+    '''One navigation: a fresh script run rebuilds the tree, runs a page and persists it'''
+    session.setup()
+    session.update('page_0')
+    page = session.active_page
+    page.setup()
+    page()
+    session.cleanup(page)
+
+
+def time_reruns(rows, copy_on_write):
+    session = build_session('Bench', rows, copy_on_write)
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        rerun(session)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    print('{:>10} {:>10} {:>14} {:>18}'.format('rows/page', 'MB total', 'deep copy (s)', 'copy on write (s)'))
+    for rows in ROWS:
+        mb = N_PAGES * rows * COLS * 8 / 1e6
+        deep = time_reruns(rows, False)
+        cow = time_reruns(rows, True)
+        print('{:>10} {:>10.0f} {:>14.4f} {:>18.4f}'.format(rows, mb, deep, cow))
@@ -9,6 +9,8 @@ setup(
         'bokeh>=2.4.1',
         'treelib>=1.6.1',
         'pyodbc>=4.0.32',
-        'pypika>=0.48.9'
+        'pypika>=0.48.9',
+        'pyarrow>=7.0.0',
+        'pandas>=2.0' #copy on write (always on from pandas 3) lets shared and cached frames skip copies
     ]
 )
@@ -0,0 +1,36 @@
+'''
+Base pages for common backends.
+
+Each page family lives in its own submodule and is only imported, together with
+its backend (pyodbc, statsmodels, matplotlib, bt...), the first time it is accessed
+from this package, e.g. 'from stream.bases import Pandas' never loads bt or pyodbc.
+'''
+from importlib import import_module
+
+_LAZY_ATTRS = {
+    'DataBase': 'database',
+    'connect': 'database',
+    'odbc_connect': 'database',
+    'POOL': 'database',
+    'SERVER': 'database',
+    'JOINS': 'database',
+    'MAGNA_SITE_ID': 'database',
+    'MAGNA_JOB_TITLE_ID': 'database',
+    'Pandas': 'frames',
+    'StatsModels': 'models',
+    'OLSPage': 'ols',
+    'Bt': 'backtest',
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    module = import_module('.{}'.format(_LAZY_ATTRS[name]), __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
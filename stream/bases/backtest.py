@@ -0,0 +1,377 @@
+import inspect
+import os
+import threading
+import time
+import multiprocessing as mp
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import product
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from bt import Backtest, Strategy, AlgoStack
+
+from ..core import Page
+
+POLL_INTERVAL = 0.5 #seconds between progress updates and cancellation checks
+
+def run_one(backtest: Backtest) -> Tuple[Backtest, float]:
+    '''Run :arg: backtest and time it, top level so it can be sent to worker processes'''
+    start = time.perf_counter()
+    backtest.run()
+    return backtest, time.perf_counter() - start
+
+def stop_workers(pool: ProcessPoolExecutor):
+    '''Cancel queued backtests and kill the ones already running'''
+    terminate = getattr(pool, 'terminate_workers', None) #python 3.14+
+    if terminate is not None:
+        terminate()
+        return
+    #NOTE: running futures can not be cancelled, so the workers are killed. shutdown forgets them, list them first
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+def cancelled(cancel) -> bool:
+    if cancel is None:
+        return False
+    is_set = getattr(cancel, 'is_set', None)
+    return is_set() if is_set is not None else bool(cancel())
+
+
+def run_backtests(bkts: Iterable[Backtest], processes=1, cancel=None, report=None) -> Dict[str, Tuple[Backtest, float]]:
+    '''
+    Run :arg: bkts and return {name: (backtest, seconds)} of those that finished.
+
+    With :arg: processes > 1 (None for one per core) they run in a pool of worker
+    processes. Strategies must then be picklable (no lambdas in their algos), and the
+    returned backtests are the copies the workers ran rather than the objects passed in.
+
+    The run stops early, killing the workers and returning the backtests that finished,
+    when :arg: cancel (a callable or threading.Event) is set, or when :arg: report raises
+    (as streamlit does when it stops the script). report(state, name, result) is called
+    with the status of every backtest whenever one starts or finishes (name and result
+    are then set) and every POLL_INTERVAL seconds while workers run.
+
+    Nothing but the return value is written, so this can run as a background job
+    (see Session.submit), which passes it a cancel event.
+    '''
+    bkts = list(bkts)
+    state = {b.name: 'queued' for b in bkts}
+    results = {}
+
+    def update(name=None, result=None):
+        if result is not None:
+            results[name] = result
+            state[name] = 'done'
+        if report is not None:
+            report(state, name, result)
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(bkts) < 2:
+        for b in bkts:
+            if cancelled(cancel):
+                break
+            state[b.name] = 'running'
+            update()
+            update(b.name, run_one(b))
+        return results
+
+    pool = ProcessPoolExecutor(min(processes, len(bkts)), mp_context=mp.get_context('spawn'))
+    pending = {}
+    try:
+        pending = {pool.submit(run_one, b): b.name for b in bkts}
+        for name in state:
+            state[name] = 'submitted'
+        update()
+
+        while pending:
+            if cancelled(cancel):
+                break
+            finished, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in finished:
+                update(pending.pop(future), future.result())
+            if not finished:
+                update() #gives streamlit a chance to stop the script
+    finally:
+        if pending:
+            stop_workers(pool)
+        else:
+            pool.shutdown()
+    return results
+
+
+def grid_points(grid: Union[Dict[str, Iterable], Iterable[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    '''Every combination of a {param: values} grid, or a list of parameter dicts as is'''
+    if isinstance(grid, dict):
+        names = list(grid)
+        return [dict(zip(names, values)) for values in product(*(list(grid[n]) for n in names))]
+    return [dict(point) for point in grid]
+
+def point_name(sweep, params) -> str:
+    return '{} [{}]'.format(sweep, ', '.join('{}={}'.format(k, v) for k, v in params.items()))
+
+def pad_data(data: pd.DataFrame) -> pd.DataFrame:
+    '''The NaN row at t0 - 1 day bt.Backtest prepends to its data'''
+    start = pd.DataFrame(np.nan, columns=data.columns, index=[data.index[0] - pd.DateOffset(days=1)])
+    return pd.concat([start, data])
+
+
+class SharedDataBacktest(Backtest):
+
+    '''bt.Backtest that takes its padded price data from :arg: padded instead of copying :arg: data'''
+
+    def __init__(self, strategy, data, padded: pd.DataFrame, **kwargs) -> None:
+        self._padded = padded
+        super().__init__(strategy, data, **kwargs)
+
+    def _process_data(self, data, additional_data):
+        if additional_data:
+            return super()._process_data(data, additional_data)
+        self.data = self._padded
+        self.dates = self._padded.index
+        self.additional_data = {}
+
+
+class SweepContext:
+
+    '''
+    What every grid point of a sweep shares: the price data (padded once), the strategy
+    factory, backtest arguments and the signals computed so far.
+
+    Each signal function takes the data and any of the grid parameters by name, and is
+    evaluated once per distinct value of the parameters it takes: with a grid over
+    lookback and threshold, a signal taking only lookback is computed once per lookback.
+    '''
+
+    def __init__(self, data: pd.DataFrame, factory: Callable[..., Strategy], signals=None, **backtest_kwargs) -> None:
+        self.data = data
+        self.padded = pad_data(data)
+        self.factory = factory
+        self.signals = signals or {}
+        self.backtest_kwargs = backtest_kwargs
+        self._signal_args = {k: list(inspect.signature(fn).parameters)[1:] for k, fn in self.signals.items()}
+        self._computed = {}
+
+    def signal_values(self, params) -> Dict[str, Any]:
+        values = {}
+        for name, fn in self.signals.items():
+            args = {a: params[a] for a in self._signal_args[name] if a in params}
+            key = (name, tuple(args.items()))
+            if key not in self._computed:
+                self._computed[key] = fn(self.data, **args)
+            values[name] = self._computed[key]
+        return values
+
+    def backtest(self, name, params) -> Backtest:
+        strategy = self.factory(**params, **self.signal_values(params))
+        return SharedDataBacktest(strategy, self.data, self.padded, name=name, **self.backtest_kwargs)
+
+    def run(self, name, params, keep_backtest=False) -> Tuple[str, pd.Series, float, Optional[Backtest]]:
+        backtest, elapsed = run_one(self.backtest(name, params))
+        return name, backtest.stats.stats, elapsed, backtest if keep_backtest else None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['padded'], state['_computed'] #rebuilt by each worker
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.padded = pad_data(self.data)
+        self._computed = {}
+
+#NOTE: set once per worker process by the pool initializer, so the data is sent to each worker once, not with every task
+_sweep_context: Optional[SweepContext] = None
+
+def init_sweep_worker(context: SweepContext):
+    global _sweep_context
+    _sweep_context = context
+
+def run_sweep_point(name, params, keep_backtest):
+    return _sweep_context.run(name, params, keep_backtest)
+
+
+class Bt(Page):
+
+    @property
+    def backtests(self) -> Dict[str, Backtest]:
+        if 'backtests' not in self.data:
+            self.data['backtests'] = {}
+        return self.data['backtests']
+
+    @property
+    def strats(self) -> Dict[str, Strategy]:
+        if 'strategies' not in self.data:
+            self.data['strategies'] = {}
+        return self.data['strategies']
+
+    @property
+    def algostacks(self) -> Dict[str, AlgoStack]:
+        if 'algostacks' not in self.data:
+            self.data['algostacks'] = {}
+        return self.data
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        '''Seconds each backtest took to run'''
+        if 'backtest_timings' not in self.data:
+            self.data['backtest_timings'] = {}
+        return self.data['backtest_timings']
+
+    def run_backtest(self, *bkts, container=None, processes=1, cancel: Optional[Union[Callable[[], bool], threading.Event]] = None):
+        '''
+        Run backtests and save in :dict: self.backtests, see :func: run_backtests.
+
+        Each backtest is stored as soon as it finishes. Progress and per backtest timings are
+        written to :arg: container if given. This writes to the page's data, so call it from
+        the script. To run backtests as a background job, submit run_backtests instead and
+        store what job.result() returns with store_backtests.
+        '''
+        progress = container.progress(0) if container is not None else None
+        status = container.empty() if container is not None else None
+
+        def report(state, name, result):
+            if result is not None:
+                self.store_backtests({name: result})
+            if progress is not None:
+                done = sum(v == 'done' for v in state.values())
+                progress.progress(done / len(bkts) if bkts else 1.0)
+                status.dataframe(pd.DataFrame({
+                    'status': pd.Series(state),
+                    'seconds': pd.Series({n: self.timings.get(n) for n in state}, dtype=float),
+                }))
+
+        run_backtests(bkts, processes, cancel, report)
+
+    def store_backtests(self, results: Dict[str, Tuple[Backtest, float]]):
+        '''Save the {name: (backtest, seconds)} returned by :func: run_backtests in self.backtests and self.timings'''
+        for name, (b, elapsed) in results.items():
+            self.backtests[name] = b
+            self.timings[name] = elapsed
+
+    @property
+    def sweeps(self) -> Dict[str, pd.DataFrame]:
+        '''Summary statistics of every parameter sweep, one row per grid point'''
+        if 'sweeps' not in self.data:
+            self.data['sweeps'] = {}
+        return self.data['sweeps']
+
+    def sweep(
+        self,
+        name,
+        factory: Callable[..., Strategy],
+        grid: Union[Dict[str, Iterable], Iterable[Dict[str, Any]]],
+        data: pd.DataFrame,
+        signals: Optional[Dict[str, Callable[..., Any]]] = None,
+        container=None,
+        processes=1,
+        keep_backtests=False,
+        cancel=None,
+        **backtest_kwargs
+    ) -> pd.DataFrame:
+        '''
+        Backtest factory(**params, **signals) for every point of :arg: grid on the same
+        price :arg: data and save the summary statistics in self.sweeps[name]: one row per
+        grid point with the parameters followed by bt's performance stats.
+
+        :arg: signals maps names to functions of (data, **params) whose results are
+        passed to the factory and reused by every grid point with the same values of the
+        parameters they take (see :class: SweepContext). The data is padded once and
+        shared by all backtests instead of being copied by each of them.
+
+        With :arg: processes > 1 the grid points run in worker processes, which receive
+        the data, factory and signals once (these must then be picklable, e.g. module level
+        functions). Run backtests are only kept in self.backtests with :arg: keep_backtests.
+        Progress, :arg: container and :arg: cancel work as in run_backtest, and like
+        run_backtest it writes to the page's data, so it is not meant to run as a job.
+        '''
+        points = {point_name(name, params): params for params in grid_points(grid)}
+        context = SweepContext(data, factory, signals, **backtest_kwargs)
+        rows = {}
+        progress = container.progress(0) if container is not None else None
+
+        def finish(point, stats, elapsed, backtest):
+            rows[point] = pd.concat([pd.Series(points[point], dtype=object), stats])
+            self.timings[point] = elapsed
+            if backtest is not None:
+                self.backtests[point] = backtest
+            if progress is not None:
+                progress.progress(len(rows) / len(points))
+
+        processes = processes or os.cpu_count() or 1
+        try:
+            if processes == 1 or len(points) < 2:
+                for point, params in points.items():
+                    if cancelled(cancel):
+                        break
+                    finish(*context.run(point, params, keep_backtests))
+            else:
+                self._sweep_parallel(context, points, processes, keep_backtests, finish, progress, cancel)
+        finally:
+            summary = pd.DataFrame.from_dict(rows, orient='index').reindex([p for p in points if p in rows])
+            self.sweeps[name] = summary.infer_objects()
+
+        return self.sweeps[name]
+
+    @staticmethod
+    def _sweep_parallel(context, points, processes, keep_backtests, finish, progress, cancel):
+        pool = ProcessPoolExecutor(
+            min(processes, len(points)),
+            mp_context=mp.get_context('spawn'),
+            initializer=init_sweep_worker,
+            initargs=(context,)
+        )
+        pending = {}
+        try:
+            pending = {pool.submit(run_sweep_point, point, params, keep_backtests): point for point, params in points.items()}
+            while pending:
+                if cancelled(cancel):
+                    return
+                finished, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    del pending[future]
+                    finish(*future.result())
+                if not finished and progress is not None:
+                    progress.progress(1 - len(pending) / len(points)) #gives streamlit a chance to stop the script
+        finally:
+            if pending:
+                stop_workers(pool)
+            else:
+                pool.shutdown()
+
+    def select_backtest(self, container, label='Select Backtest', key=None) -> Backtest:
+        name = container.selectbox(
+            label=label,
+            options=self.backtests.keys(),
+            key=key
+        )
+
+        return self.backtests[name]
+
+    def multi_select_backtest(self, container, label='Select Backtests', key=None) -> List[Backtest]:
+        names = container.multiselect(
+            label=label,
+            options=self.backtests.keys(),
+            key=key
+        )
+
+        return [self.backtests[n] for n in names]
+
+    def select_strategy(self, container, label='Select Strategy', key=None) -> Strategy:
+        name = container.selectbox(
+            label=label,
+            options=self.strats.keys(),
+            key=key
+        )
+
+        return self.strats[name]
+
+    def multi_select_strategy(self, container, label='Select Strategies', key=None) -> List[Strategy]:
+        names = container.multiselect(
+            label=label,
+            options=self.strats.keys(),
+            key=key
+        )
+
+        return [self.strats[n] for n in names]
@@ -0,0 +1,264 @@
+import os
+import re
+import time
+import datetime
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pypika
+from typing import TYPE_CHECKING, Dict, Hashable, Optional, Tuple, Union
+from decimal import Decimal
+
+from ..cache import DEFAULT_TTL, LRUCache, shared_copy
+from ..pool import ConnectionPool, PooledConnection
+
+if TYPE_CHECKING:
+    import pyodbc
+
+SERVER = "tcp:shift-{}.database.windows.net,1433" #TODO: check this follows security standards
+JOINS = [x.name for x in pypika.JoinType]
+MAGNA_SITE_ID = 'F88A472C-27B5-4114-B4FE-68B4D98BF60E'
+MAGNA_JOB_TITLE_ID = '631AB19C-ED7A-4372-A612-7C14469A1308'
+BATCH_SIZE = 50_000
+QUERY_CACHE_BYTES = 512 * 2**20
+QUERY_CACHE_TTL = 600
+SPILL_TTL = 7 * 86400 #for spilled entries that were cached without a ttl
+#dtypes of the columns of empty results by the python type in cursor.description
+EMPTY_DTYPES = {int: 'int64', float: 'float64', bool: 'bool', str: str, datetime.datetime: 'datetime64[ns]'}
+
+def odbc_connect(uid, pwd, server, database='Core') -> 'pyodbc.Connection':
+    #NOTE: imported here so the module (and the SQLite backed tests) work without unixODBC
+    import pyodbc
+    return pyodbc.connect(connect(uid, pwd, server, database))
+
+def normalize_sql(sql: str) -> str:
+    '''Collapse whitespace outside of quoted literals and identifiers, drop trailing semicolons'''
+    parts = re.split(r"""('(?:[^']|'')*'|"[^"]*"|\[[^\]]*\])""", str(sql))
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r'\s+', ' ', parts[i])
+    return ''.join(parts).strip().rstrip(';').rstrip()
+
+
+class QueryCache(LRUCache):
+
+    '''
+    Process wide cache of query results keyed on (normalized sql, uid, server, database,
+    password digest), so a result is only served to callers that logged in as its owner.
+
+    Results are kept as one DataFrame per query and every hit hands out a copy that
+    shares its buffers, so sessions reading the same result do not each hold a copy.
+    When :arg: directory is given, entries evicted to stay under :arg: max_bytes are
+    written there as Parquet files and read back on the next lookup until they expire.
+    '''
+
+    def __init__(self, max_bytes=QUERY_CACHE_BYTES, ttl=QUERY_CACHE_TTL, directory=None) -> None:
+        super().__init__(max_bytes=max_bytes, ttl=ttl, on_evict=self._spill if directory else None)
+        self.directory = directory
+        self.stats.disk_hits = 0
+        self.stats.spill_errors = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(q, target: Tuple[str, str, str], digest: Optional[str] = None, **options) -> Tuple[str, ...]:
+        ''':arg: options are the fetch options that change the result, e.g. float_decimals'''
+        return (normalize_sql(str(q)),) + tuple(target) + (digest,) + tuple(sorted(options.items()))
+
+    def get(self, key: Hashable, default=None):
+        df = super().get(key)
+        if df is None and self.directory is not None:
+            df = self._load(key)
+            if df is not None:
+                with self._lock:
+                    self.stats.misses -= 1
+                    self.stats.disk_hits += 1
+        return default if df is None else shared_copy(df)
+
+    def put(self, key: Hashable, df: pd.DataFrame, ttl=DEFAULT_TTL):
+        super().put(key, shared_copy(df), ttl)
+
+    def clear(self):
+        super().clear()
+        if self.directory is not None:
+            for f in os.listdir(self.directory):
+                if f.endswith('.parquet'):
+                    os.remove(os.path.join(self.directory, f))
+
+    def _path(self, key) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, '{}.parquet'.format(digest))
+
+    #NOTE: a spilled file's modification time holds the wall clock time it expires at
+    def _spill(self, key, df: pd.DataFrame, expires: Optional[float]):
+        '''Runs inside put of another entry, so a frame Parquet can not store (e.g. mixed object columns) is dropped instead'''
+        path = self._path(key)
+        try:
+            df.to_parquet(path)
+        except Exception:
+            self.stats.spill_errors += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+        remaining = SPILL_TTL if expires is None else expires - time.monotonic()
+        expires_at = time.time() + remaining
+        os.utime(path, (expires_at, expires_at))
+
+    def _load(self, key) -> Optional[pd.DataFrame]:
+        path = self._path(key)
+        try:
+            expires_at = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            os.remove(path)
+            return None
+
+        df = pd.read_parquet(path)
+        os.remove(path)
+        super().put(key, df, remaining)
+        return df
+
+#NOTE: module level so warm connections and cached results are shared by every session on the process
+POOL = ConnectionPool(odbc_connect)
+QUERY_CACHE = QueryCache()
+
+class DataBase:
+
+    pool = POOL
+    query_cache = QUERY_CACHE
+
+    def conn(self, uid, pwd, server='prod', database='Core') -> PooledConnection:
+        '''Check out a pooled connection, call close() or use a with block to return it'''
+        return self.pool.acquire(uid, pwd, server, database)
+
+    def read_query(self, conn, q: Union[pypika.queries.QueryBuilder, str], container=None, batch_size=BATCH_SIZE, max_rows=None, max_bytes=None, float_decimals=False) -> pd.DataFrame:
+        '''Execute :arg: q and fetch its result in batches, see :func: fetch_frame'''
+        cursor = conn.cursor()
+        try:
+            cursor.execute(str(q))
+            return fetch_frame(cursor, container, batch_size, max_rows, max_bytes, float_decimals)
+        finally:
+            cursor.close()
+
+    def cached_query(self, conn, q, container=None, target=None, ttl=DEFAULT_TTL, **fetch_kwargs) -> pd.DataFrame:
+        '''
+        read_query through the process wide query cache. :arg: target is the
+        (uid, server, database) the result is cached under, taken from pooled
+        connections when not given. Results are also keyed on the password the pooled
+        connection was opened with (see pool.credential_digest), so a hit is only served
+        to a caller whose login already passed the server's check. Truncated results are not cached.
+        '''
+        key = self.query_cache.make_key(
+            q, target or conn.key, getattr(conn, 'digest', None), float_decimals=bool(fetch_kwargs.get('float_decimals'))
+        )
+        df = self.query_cache.get(key)
+        if df is None:
+            df = self.read_query(conn, q, container, **fetch_kwargs)
+            if not df.attrs.get('truncated'):
+                self.query_cache.put(key, df, ttl)
+        return df
+
+    def query_to_dataset(self, name, conn, q, container=None, **fetch_kwargs) -> pd.DataFrame:
+        '''Fetch the result of :arg: q into self.datasets[name], for pages that also subclass Pandas'''
+        datasets: Dict[str, pd.DataFrame] = self.datasets
+        datasets[name] = self.read_query(conn, q, container, **fetch_kwargs)
+        return datasets[name]
+
+    def display_query_text(self, q, container=None):
+        container.text(str(q))
+
+    def query_from_text(self, container=None):
+        query_text = container.text_area('Input query here')
+        return query_text
+
+def connect(uid, pwd, server, database='Core'):
+    driver = "{ODBC Driver 17 for SQL Server}"
+    conn_str = 'DRIVER={};SERVER={};DATABASE={};UID={};PWD={}'.format(driver, server, database, uid, pwd)
+    return conn_str
+
+def decimal_dtype(precision, scale) -> Optional[pd.ArrowDtype]:
+    '''Exact Arrow dtype of a DECIMAL(precision, scale) column, None if the cursor does not report them'''
+    if precision is None or scale is None:
+        return None
+    if precision <= 38:
+        return pd.ArrowDtype(pa.decimal128(precision, scale))
+    if precision <= 76:
+        return pd.ArrowDtype(pa.decimal256(precision, scale))
+    return None
+
+def column_dtypes(description, float_decimals=False) -> list:
+    '''Dtype of each column of a cursor.description, None to let pandas infer it'''
+    dtypes = []
+    for d in description:
+        if d[1] is Decimal:
+            dtypes.append('float64' if float_decimals else decimal_dtype(d[4], d[5]))
+        else:
+            dtypes.append(None)
+    return dtypes
+
+def empty_dtype(description, dtype):
+    if dtype is not None:
+        return dtype
+    return EMPTY_DTYPES.get(description[1], object)
+
+def fetch_frame(cursor, container=None, batch_size=BATCH_SIZE, max_rows=None, max_bytes=None, float_decimals=False) -> pd.DataFrame:
+    '''
+    Build a DataFrame from an executed DB-API cursor with fetchmany.
+
+    Each batch is converted to typed column arrays straight away, so only one batch of
+    raw row tuples is held at a time. DECIMAL and MONEY columns keep their exact values
+    as Arrow decimals of the precision and scale in cursor.description (Decimal objects
+    when it has none), or become float64 with :arg: float_decimals. Columns of empty
+    results get dtypes from cursor.description too. Progress is written to :arg: container
+    if given. Fetching stops early once :arg: max_rows rows or :arg: max_bytes bytes of
+    column data have been read, in which case the result has attrs['truncated'] set to True.
+    '''
+    columns = [d[0] for d in cursor.description]
+    dtypes = column_dtypes(cursor.description, float_decimals)
+    chunks = [[] for _ in columns]
+    n_rows = 0
+    n_bytes = 0
+    truncated = False
+
+    status = container.empty() if container is not None else None
+    bar = container.progress(0) if (container is not None and max_rows) else None
+
+    while True:
+        size = batch_size if max_rows is None else min(batch_size, max_rows - n_rows)
+        rows = cursor.fetchmany(size) if size > 0 else []
+        if not rows:
+            truncated = max_rows is not None and n_rows >= max_rows and cursor.fetchone() is not None
+            break
+
+        for i, values in enumerate(zip(*rows)):
+            col = pd.Series(values, dtype=dtypes[i])
+            chunks[i].append(col)
+            n_bytes += int(col.memory_usage(index=False, deep=True))
+        n_rows += len(rows)
+        del rows
+
+        if status is not None:
+            status.text('Fetched {:,} rows ({:,.1f} MB)'.format(n_rows, n_bytes / 1e6))
+        if bar is not None:
+            bar.progress(min(n_rows / max_rows, 1.0))
+
+        if max_bytes is not None and n_bytes >= max_bytes:
+            truncated = True
+            break
+
+    data = {}
+    for i in range(len(columns)):
+        col = chunks[i]
+        data[i] = pd.concat(col, ignore_index=True) if col else pd.Series(dtype=empty_dtype(cursor.description[i], dtypes[i]))
+        chunks[i] = None #release batches column by column to keep peak memory near the final size
+    df = pd.DataFrame(data)
+    df.columns = columns
+    df.attrs['truncated'] = truncated
+
+    if status is not None and truncated:
+        status.warning('Stopped after {:,} rows ({:,.1f} MB), result is truncated'.format(n_rows, n_bytes / 1e6))
+    return df
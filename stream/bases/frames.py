@@ -0,0 +1,128 @@
+import pandas as pd
+from typing import Dict, MutableMapping, Union
+from functools import partial
+
+from ..core import Page
+from .. import export, ingest
+
+class Pandas(Page):
+
+    DEFAULT_NAME_COUNTER = 1
+
+    #NOTE: any mapping factory works, e.g. stream.store.DatasetStore to spill large frames to disk
+    dataset_store = dict
+
+    @property
+    def datasets(self) -> MutableMapping:
+        if 'datasets' not in self.data:
+            self.data['datasets'] = self.dataset_store()
+        return self.data['datasets']
+
+    def view(self, df: Union[pd.DataFrame, pd.Series, str], container, preview=False) -> None:
+        if isinstance(df, str):
+            df = self.datasets[df]
+
+        if preview:
+            df = df.head(10)
+
+        container.dataframe(df)
+
+    def describe(self, df: Union[pd.DataFrame, str], container) -> None:
+        if isinstance(df, str):
+            df = self.datasets[df]
+
+        df_description = df.describe()
+        self.view(df_description, container)
+
+    def select(self, container, key=None, label='Select Dataset') -> Union[pd.DataFrame, pd.Series]:
+
+        name = container.selectbox(label, self.datasets.keys(), key=key)
+        return self.datasets[name]
+
+    def multi_select(self, container, label='Select Datasets', key=None) -> Dict[str, pd.DataFrame]:
+        
+        keys = container.multiselect(label, self.datasets.keys(), label)
+        return {k: self.datasets[k] for k in keys}
+
+    def from_clipboard(self, button, container, name=None, label='Upload from Clipboard', key=None):
+        if name is None:
+            name = 'Dataset{}'.format(self.DEFAULT_NAME_COUNTER)
+            self.DEFAULT_NAME_COUNTER += 1
+        
+        button =  container.button(
+            label=label,
+            key=key
+        )
+
+        if button:
+            return pd.read_clipboard()
+
+    def to_clipboard(self, df: Union[pd.DataFrame, pd.Series], container, label='Copy to Clipboard', key=None):
+        return container.button(
+            label=label,
+            on_click=df.to_clipboard,
+            key=key
+        )
+
+    def from_excel(self, container, label='Upload Excel', key=None):
+        return container.file_uploader(
+            label=label,
+            type=['xlsx'],
+            key=key
+        )
+
+    def upload(self, container, name=None, label='Upload Data', key=None, compact=True) -> Union[pd.DataFrame, None]:
+        '''
+        Upload a csv, xlsx, parquet or feather file into self.datasets[name] (defaults to
+        the file name) with compact dtypes and report its memory footprint. The file is
+        only parsed again when a different one is uploaded.
+        '''
+        file = container.file_uploader(label=label, type=ingest.UPLOAD_TYPES, key=key)
+        if file is None:
+            return None
+
+        if name is None:
+            name = file.name.rsplit('.', 1)[0]
+        file_id = getattr(file, 'file_id', None) or (file.name, file.size)
+
+        uploads = self.data.setdefault('uploads', {})
+        if uploads.get(name) != file_id or name not in self.datasets:
+            df, report = ingest.ingest(file, file.name, compact=compact)
+            self.datasets[name] = df
+            uploads[name] = file_id
+            self.data.setdefault('upload_reports', {})[name] = report
+
+        df = self.datasets[name]
+        report = self.data['upload_reports'][name]
+        container.caption('{}: {:,} rows x {} columns, {:,.1f} MB in memory ({:,.1f} MB as parsed)'.format(
+            name, df.shape[0], df.shape[1], report.loc['Total', 'bytes'] / 1e6, report.loc['Total', 'parsed bytes'] / 1e6
+        ))
+        return df
+
+    def to_excel(self, df: Union[pd.DataFrame, pd.Series], container, writer=None, filename=None, sheet_name='Sheet1', label='Download Excel', key=None):
+        '''Lazy xlsx download, or write into :arg: writer when assembling a workbook yourself'''
+        if writer is not None:
+            return df.to_excel(writer, sheet_name=sheet_name)
+
+        return self.download(df, container, 'xlsx', filename or 'mydata.xlsx', label, key, sheet_name=sheet_name)
+
+    def download(self, df: Union[pd.DataFrame, pd.Series], container, fmt='xlsx', filename=None, label=None, key=None, **export_kwargs):
+        '''
+        Download button for :arg: df as 'xlsx', 'parquet' or 'csv.gz'. The file is only
+        generated once the user asks for it: on click with streamlit >= 1.52, otherwise
+        through a 'Prepare' button shown before the download button.
+        '''
+        exporter, ext, mime = export.EXPORTERS[fmt]
+        if isinstance(df, pd.Series):
+            df = df.to_frame()
+
+        filename = filename or 'mydata.{}'.format(ext)
+        label = label or 'Download {}'.format(ext)
+        data = partial(exporter, df, **export_kwargs)
+
+        if export.LAZY_DOWNLOADS:
+            return container.download_button(label, data, filename, mime, key=key)
+
+        prepare_key = None if key is None else '{}_prepare'.format(key)
+        if container.button('Prepare {}'.format(filename), key=prepare_key):
+            return container.download_button(label, data(), filename, mime, key=key)
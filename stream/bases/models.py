@@ -0,0 +1,468 @@
+import os
+import weakref
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from scipy.linalg import solve_triangular
+from statsmodels.regression.linear_model import OLS, OLSResults, RegressionResults, RegressionResultsWrapper
+from statsmodels.iolib.summary2 import Summary
+
+from ..cache import LRUCache, fingerprint
+from ..core import Page
+
+FIT_CACHE_SIZE = 128
+RANK_TOL = 1e-10
+FIT_STATS = [
+    'nobs', 'df_model', 'df_resid', 'rsquared', 'rsquared_adj', 'prsquared', 'fvalue',
+    'f_pvalue', 'llf', 'llnull', 'aic', 'bic', 'scale', 'condition_number'
+]
+RESID_ATTRS = ['resid', 'resid_response', 'resid_pearson'] #in order of preference
+
+#NOTE: module level so sessions fitting the same model on the same data share the result
+FIT_CACHE = LRUCache(max_entries=FIT_CACHE_SIZE)
+
+def model_fingerprint(model, fit_kwargs=None) -> str:
+    '''Hash of the model class, its data and row labels, formula, variable names and init and fit arguments'''
+    init_kwargs = {k: getattr(model, k, None) for k in getattr(model, '_init_keys', [])}
+    #NOTE: results carry the row labels (resid, fittedvalues), equal values on another index are another result
+    row_labels = getattr(getattr(model, 'data', None), 'row_labels', None)
+    return fingerprint(
+        type(model).__module__,
+        type(model).__qualname__,
+        model.endog,
+        model.exog,
+        row_labels,
+        getattr(model, 'formula', None),
+        getattr(model, 'endog_names', None),
+        getattr(model, 'exog_names', None),
+        init_kwargs,
+        fit_kwargs or {}
+    )
+
+class ModelSpec:
+
+    '''
+    One model to fit on a DataFrame: :arg: endog regressed on the :arg: exog columns,
+    optionally on the :arg: rows selected by a boolean mask or index labels.
+    '''
+
+    def __init__(self, name, endog, exog, model_class=OLS, add_constant=True, rows=None, **fit_kwargs) -> None:
+        self.name = name
+        self.endog = endog
+        self.exog = list(exog)
+        self.model_class = model_class
+        self.add_constant = add_constant
+        self.rows = rows
+        self.fit_kwargs = fit_kwargs
+
+    @property
+    def columns(self) -> List:
+        return [self.endog] + self.exog
+
+    def build(self, data: pd.DataFrame, missing='drop'):
+        if self.rows is not None:
+            data = data.loc[self.rows]
+        exog = data[self.exog]
+        if self.add_constant:
+            exog.insert(0, 'const', 1.0) #same as add_constant(has_constant='add') without its constant checks
+        return self.model_class(data[self.endog], exog, missing=missing)
+
+    def shares_qr(self) -> bool:
+        '''Plain OLS with the default covariance can be solved from a shared decomposition'''
+        return self.model_class is OLS and set(self.fit_kwargs) <= {'cov_type'} and self.fit_kwargs.get('cov_type', 'nonrobust') == 'nonrobust'
+
+    def __repr__(self) -> str:
+        return '{}({!r}, {} ~ {})'.format(self.__class__.__name__, self.name, self.endog, ' + '.join(map(str, self.exog)))
+
+def subset_specs(endog, candidates: Iterable, min_size=1, max_size=None, **spec_kwargs) -> List[ModelSpec]:
+    '''A spec for every subset of the candidate exogenous variables'''
+    candidates = list(candidates)
+    max_size = len(candidates) if max_size is None else max_size
+    return [
+        ModelSpec('{} ~ {}'.format(endog, ' + '.join(map(str, exog))), endog, exog, **spec_kwargs)
+        for size in range(min_size, max_size + 1)
+        for exog in combinations(candidates, size)
+    ]
+
+def group_specs(data: pd.DataFrame, by, endog, exog, **spec_kwargs) -> List[ModelSpec]:
+    '''The same regression fit separately on every group of :arg: data.groupby(by)'''
+    return [
+        ModelSpec('{} ~ {} [{}]'.format(endog, ' + '.join(map(str, exog)), group), endog, exog, rows=rows, **spec_kwargs)
+        for group, rows in data.groupby(by).groups.items()
+    ]
+
+def fit_shared_qr(models: Dict[str, OLS]) -> Dict[str, RegressionResultsWrapper]:
+    '''
+    Fit OLS models on the same rows from a single QR decomposition X = QR of the
+    union of their design columns. For a model using columns S, X_S = Q R_S and the
+    small QR R_S = Q2 R2 gives its fit exactly as statsmodels' qr method would, without
+    touching the n rows again except for the pinv statsmodels keeps for robust covariances.
+    Models whose design is rank deficient are left out and should be fit directly.
+    '''
+    design, endogs = {}, {}
+    for model in models.values():
+        for j, c in enumerate(model.exog_names):
+            design.setdefault(c, model.wexog[:, j])
+        endogs.setdefault(model.endog_names, model.wendog)
+
+    columns = list(design)
+    Q, R = np.linalg.qr(np.column_stack(list(design.values())))
+    effects = Q.T @ np.column_stack(list(endogs.values()))
+    endog_position = {e: i for i, e in enumerate(endogs)}
+    position = {c: i for i, c in enumerate(columns)}
+
+    results = {}
+    for name, model in models.items():
+        idx = [position[c] for c in model.exog_names]
+        Q2, R2 = np.linalg.qr(R[:, idx])
+        diag = np.abs(np.diag(R2))
+        if diag.min() <= RANK_TOL * diag.max():
+            continue
+
+        z = Q2.T @ effects[:, endog_position[model.endog_names]]
+        R2_inv = solve_triangular(R2, np.eye(len(idx)))
+        model.normalized_cov_params = R2_inv @ R2_inv.T
+        model.wexog_singular_values = np.linalg.svd(R2, compute_uv=False)
+        model.rank = len(idx)
+        model.pinv_wexog = R2_inv @ (Q @ Q2).T
+        model.effects = z
+        if model._df_model is None:
+            model._df_model = float(model.rank - model.k_constant)
+        if model._df_resid is None:
+            model.df_resid = model.nobs - model.rank
+
+        beta = solve_triangular(R2, z)
+        results[name] = RegressionResultsWrapper(OLSResults(model, beta, normalized_cov_params=model.normalized_cov_params))
+    return results
+
+def fit_statistics(result) -> Dict[str, float]:
+    '''The FIT_STATS a fitted model (or CompactResults) defines, as floats'''
+    if isinstance(result, CompactResults):
+        return dict(result.stats)
+    stats = {}
+    for attr in FIT_STATS:
+        try:
+            stats[attr] = float(getattr(result, attr))
+        except Exception: #not defined for this model type
+            pass
+    return stats
+
+def test_statistic(result) -> str:
+    ''''t' for models reporting t statistics, 'z' for those using the normal distribution (use_t False, e.g. Logit)'''
+    return 't' if getattr(result, 'use_t', True) else 'z'
+
+def coefficient_table(result, alpha=0.05) -> pd.DataFrame:
+    '''Estimates, standard errors, t (or z) statistics, p values and confidence bounds by term'''
+    ci = result.conf_int(alpha)
+    stat = test_statistic(result)
+    return pd.DataFrame({
+        'coef': result.params,
+        'std err': result.bse,
+        stat: result.tvalues,
+        'P>|{}|'.format(stat): result.pvalues,
+        '[{}'.format(alpha / 2): ci.iloc[:, 0],
+        '{}]'.format(1 - alpha / 2): ci.iloc[:, 1],
+    }, dtype=float)
+
+def fit_model(model, fit_kwargs):
+    '''Top level so it can be sent to worker processes'''
+    return model.fit(**fit_kwargs)
+
+class Refit:
+
+    '''
+    Refits a model from what it needs: the model class, its data and its init and fit
+    arguments, held strongly so compact results can be expanded after the fit cache
+    evicted the full results. The data are the pandas objects the model was built from,
+    shared (copy on write) rather than copied, and copying a Refit, as Session does with
+    page data, returns the same object.
+    '''
+
+    def __init__(self, model_class, endog, exog, init_kwargs=None, fit_kwargs=None) -> None:
+        self.model_class = model_class
+        self.endog = endog
+        self.exog = exog
+        self.init_kwargs = init_kwargs or {}
+        self.fit_kwargs = fit_kwargs or {}
+
+    @classmethod
+    def from_model(cls, model, fit_kwargs=None):
+        '''The model's data after missing rows were dropped, and its data dependent init arguments'''
+        init_kwargs = {k: getattr(model, k) for k in getattr(model, '_init_keys', []) if hasattr(model, k)}
+        return cls(type(model), model.data.orig_endog, model.data.orig_exog, init_kwargs, fit_kwargs)
+
+    def __call__(self):
+        return self.model_class(self.endog, self.exog, **self.init_kwargs).fit(**self.fit_kwargs)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class SpecRefit(Refit):
+
+    '''Refits a :class: ModelSpec on the frame it was fit on, see :class: Refit'''
+
+    def __init__(self, spec: ModelSpec, data: pd.DataFrame) -> None:
+        self.spec = spec
+        self.data = data
+
+    def __call__(self):
+        return self.spec.build(self.data).fit(**self.spec.fit_kwargs)
+
+def residual_type(result) -> Optional[str]:
+    '''Which of RESID_ATTRS :func: residuals returns for :arg: result, None if it has none'''
+    if isinstance(result, CompactResults):
+        return getattr(result, 'resid_type', 'resid')
+    for attr in RESID_ATTRS:
+        try:
+            getattr(result, attr)
+            return attr
+        except (AttributeError, NotImplementedError):
+            pass
+    return None
+
+def residuals(result):
+    '''result.resid, or the response (or Pearson) residuals of models without it, e.g. Logit. None if there are none'''
+    attr = residual_type(result)
+    return None if attr is None else getattr(result, attr)
+
+
+class CompactModel:
+
+    '''Stands in for result.model: observed values and variable names, no design matrix'''
+
+    def __init__(self, result, endog) -> None:
+        self.endog = endog
+        self.endog_names = getattr(result.model, 'endog_names', None)
+        self.exog_names = getattr(result.model, 'exog_names', None)
+        self.model_class = type(result.model).__name__
+
+
+class CompactResults:
+
+    '''
+    Coefficients, covariance, fit statistics and float32 fitted values and residuals
+    of a fitted statsmodels model, without the model's data or the full results object.
+    The residuals are result.resid, or :func: residuals for models without it (None
+    when there are none).
+
+    full() returns the complete results object: from memory while it is still
+    referenced (e.g. by the process wide fit cache), otherwise by calling :arg: refit
+    (see :class: Refit).
+    '''
+
+    def __init__(self, result, key: Optional[str] = None, refit: Optional[Callable] = None) -> None:
+        self.params = result.params
+        self.bse = result.bse
+        self.tvalues = result.tvalues
+        self.pvalues = result.pvalues
+        self._conf_int = result.conf_int()
+        self._cov_params = result.cov_params()
+        self.stats = fit_statistics(result)
+        self.use_t = getattr(result, 'use_t', True)
+
+        fitted = np.asarray(result.fittedvalues)
+        self.resid_type = residual_type(result)
+        resid = residuals(result)
+        index = getattr(result.fittedvalues, 'index', None)
+        self.fittedvalues = pd.Series(fitted.astype(np.float32), index=index, name='fitted')
+        self.resid = None if resid is None else pd.Series(np.asarray(resid).astype(np.float32), index=index, name='resid')
+        self.model = CompactModel(result, np.asarray(result.model.endog).astype(np.float32))
+
+        self.key = key
+        self.refit = refit
+        self._full = weakref.ref(result)
+
+    def __getattr__(self, name):
+        stats = self.__dict__.get('stats', {})
+        if name in stats:
+            return stats[name]
+        raise AttributeError('{!r} has no attribute {!r}, use full() for the complete results'.format(self.__class__.__name__, name))
+
+    def conf_int(self, alpha=0.05) -> pd.DataFrame:
+        if alpha == 0.05:
+            return self._conf_int
+        return self.full().conf_int(alpha)
+
+    def cov_params(self) -> pd.DataFrame:
+        return self._cov_params
+
+    def full(self):
+        result = self._full()
+        if result is None and self.key is not None:
+            result = FIT_CACHE.get(self.key)
+        if result is None:
+            if self.refit is None:
+                raise Exception('The full results are no longer in memory and can not be refit')
+            result = self.refit()
+            if self.key is not None:
+                FIT_CACHE.put(self.key, result)
+        self._full = weakref.ref(result)
+        return result
+
+    def summary2(self, title=None, alpha=0.05) -> Summary:
+        coefs = coefficient_table(self, alpha)
+        info = {'Model:': self.model.model_class, 'Dependent Variable:': str(self.model.endog_names)}
+        info.update({'{}:'.format(k): '{:,.0f}'.format(v) if v.is_integer() else '{:.4g}'.format(v) for k, v in self.stats.items()})
+
+        smry = Summary()
+        smry.add_title(title or '{} Results (compact)'.format(self.model.model_class))
+        smry.add_dict(info)
+        smry.add_df(coefs, float_format='%.4f')
+        return smry
+
+
+class StatsModels(Page):
+
+    '''
+    Implements front end elements for OLS and Logit models
+    '''
+
+    @property
+    def results(self) -> Dict[str, Union[RegressionResults, CompactResults]]:
+        if 'regression_results' not in self.data:
+            self.data['regression_results'] = {}
+        return self.data['regression_results']
+
+    fit_cache = FIT_CACHE
+
+    #NOTE: set to keep CompactResults in self.results instead of the full results objects
+    compact_results = False
+
+    def fit(self, model, name, use_cache=True, **fit_kwargs) -> Union[RegressionResults, CompactResults]:
+        '''Fit :arg: model into self.results[name], reusing an identical fit made by any session'''
+        key = None
+        if use_cache and self.fit_cache is not None:
+            key = model_fingerprint(model, fit_kwargs)
+            result = self.fit_cache.get_or_set(key, lambda: model.fit(**fit_kwargs))
+        else:
+            result = model.fit(**fit_kwargs)
+        return self.store_result(name, result, key, Refit.from_model(model, fit_kwargs))
+
+    def store_result(self, name, result, key=None, refit=None) -> Union[RegressionResults, CompactResults]:
+        if self.compact_results:
+            result = CompactResults(result, key, refit)
+        self.results[name] = result
+        return result
+
+    def full_result(self, name) -> RegressionResults:
+        '''The complete results object for :arg: name, also when only a compact copy is stored'''
+        result = self.results[name]
+        return result.full() if isinstance(result, CompactResults) else result
+
+    def fit_many(self, data: pd.DataFrame, specs: Iterable[ModelSpec], container=None, processes=None, use_cache=True) -> Dict[str, Union[RegressionResults, CompactResults]]:
+        '''
+        Fit every spec on :arg: data into self.results. OLS specs that share their rows
+        are solved together from one QR decomposition, other models (Logit, ...) are fit
+        in a pool of :arg: processes worker processes (defaults to the number of cores).
+        Progress is written to :arg: container if given.
+        '''
+        specs = list(specs)
+        use_cache = use_cache and self.fit_cache is not None
+        done = {}
+        progress = container.progress(0) if container is not None else None
+
+        specs_by_name = {spec.name: spec for spec in specs}
+
+        def finish(name, key, result):
+            if use_cache:
+                self.fit_cache.put(key, result)
+            done[name] = self.store_result(name, result, key if use_cache else None, SpecRefit(specs_by_name[name], data))
+            if progress is not None:
+                progress.progress(len(done) / len(specs))
+
+        #NOTE: keys hash every column once rather than every model's arrays, so they differ from fit's keys
+        index_digest = fingerprint(data.index)
+        column_digests = {}
+        def spec_key(spec):
+            for c in spec.columns:
+                if c not in column_digests:
+                    column_digests[c] = fingerprint(data[c])
+            return fingerprint(
+                'fit_many', spec.model_class.__module__, spec.model_class.__qualname__, spec.endog, spec.exog,
+                index_digest, [column_digests[c] for c in spec.columns], spec.rows, spec.add_constant, spec.fit_kwargs
+            )
+
+        keys, pending = {}, []
+        for spec in specs:
+            keys[spec.name] = spec_key(spec)
+            cached = self.fit_cache.get(keys[spec.name]) if use_cache else None
+            if cached is not None:
+                finish(spec.name, keys[spec.name], cached)
+            else:
+                pending.append(spec)
+
+        #OLS specs fit on the same rows, in the same order, share one QR decomposition
+        notna = data.notna()
+        groups = {}
+        for spec in pending:
+            if spec.shares_qr():
+                mask = notna[spec.columns].to_numpy().all(axis=1)
+                rows = None if spec.rows is None else id(spec.rows)
+                groups.setdefault((rows, mask.tobytes()), (mask, []))[1].append(spec)
+
+        models = {}
+        for mask, group in groups.values():
+            if group[0].rows is None: #drop incomplete rows once for the whole group
+                complete = data[mask]
+                group_models = {spec.name: spec.build(complete, missing='none') for spec in group}
+            else:
+                group_models = {spec.name: spec.build(data) for spec in group}
+            models.update(group_models)
+
+            for name, result in fit_shared_qr(group_models).items():
+                finish(name, keys[name], result)
+        models.update({spec.name: spec.build(data) for spec in pending if spec.name not in models})
+
+        remaining = [s for s in pending if s.name not in done]
+        processes = processes or os.cpu_count() or 1
+        iterative = [s for s in remaining if not s.shares_qr()]
+
+        if processes > 1 and len(iterative) > 1:
+            with ProcessPoolExecutor(min(processes, len(iterative)), mp_context=mp.get_context('spawn')) as pool:
+                futures = {pool.submit(fit_model, models[s.name], s.fit_kwargs): s.name for s in iterative}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    finish(name, keys[name], future.result())
+
+        for spec in remaining:
+            if spec.name not in done:
+                finish(spec.name, keys[spec.name], fit_model(models[spec.name], spec.fit_kwargs))
+
+        return done
+
+    def compare_results(self, names: Optional[Iterable[str]] = None, alpha=0.05) -> pd.DataFrame:
+        '''
+        One row per result in :arg: names (defaults to every result) with a column group
+        per coefficient table column (coef, std err, t, P>|t|, confidence bounds) holding
+        one column per term (z, P>|z| when every model reports z statistics, t/z when they are mixed), NaN where a model does not use the term, and a 'stats' group
+        with the fit statistics.
+        '''
+        names = list(self.results) if names is None else list(names)
+        results = [self.results[name] for name in names]
+
+        groups = {}
+        if results:
+            groups['coef'] = pd.DataFrame([r.params for r in results], index=names)
+            groups['std err'] = pd.DataFrame([r.bse for r in results], index=names)
+            stats = {test_statistic(r) for r in results}
+            stat = stats.pop() if len(stats) == 1 else 't/z'
+            groups[stat] = pd.DataFrame([r.tvalues for r in results], index=names)
+            groups['P>|{}|'.format(stat)] = pd.DataFrame([r.pvalues for r in results], index=names)
+            bounds = [r.conf_int(alpha) for r in results]
+            groups['[{}'.format(alpha / 2)] = pd.DataFrame([ci.iloc[:, 0] for ci in bounds], index=names)
+            groups['{}]'.format(1 - alpha / 2)] = pd.DataFrame([ci.iloc[:, 1] for ci in bounds], index=names)
+        groups['stats'] = pd.DataFrame([fit_statistics(r) for r in results], index=names, columns=FIT_STATS).dropna(axis=1, how='all')
+
+        return pd.concat(groups, axis=1).astype(float)
+
+    def variable_selection_input(self, data: pd.DataFrame, container):
+        endog = container.selectbox('Endogenous Variable', data.columns)
+        exog = container.multiselect('Exogenous Variable(s)', data.columns)
+        return endog, exog
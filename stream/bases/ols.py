@@ -0,0 +1,181 @@
+import pandas as pd
+import numpy as np
+from io import BytesIO
+from typing import List
+from statsmodels.stats.stattools import durbin_watson, jarque_bera, omni_normtest
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from bokeh.plotting import ColumnDataSource
+
+from ..cache import FINGERPRINT_SAMPLE_ROWS, fingerprint
+from ..plotting import FIGURE_CACHE, qq_points
+from .models import StatsModels, coefficient_table, fit_statistics, residual_type, residuals
+
+OUTLIER_SHARE = 0.01
+
+#NOTE: rendered PNGs share the process wide figure cache's memory budget
+PLOT_CACHE = FIGURE_CACHE
+
+def thin_points(x, y, max_points, outlier_share=OUTLIER_SHARE) -> np.ndarray:
+    '''
+    Indices of at most :arg: max_points points: evenly spaced ranks of :arg: x, so the
+    sample is stratified along the x axis, plus the :arg: outlier_share of points
+    furthest from the median of :arg: y, which a uniform sample would mostly drop.
+    '''
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    n_outliers = int(max_points * outlier_share)
+    ranks = np.argsort(x, kind='stable')
+    strata = ranks[np.linspace(0, n - 1, max_points - n_outliers).astype(np.int64)]
+    outliers = np.argpartition(np.abs(y - np.median(y)), n - n_outliers)[n - n_outliers:] if n_outliers else []
+    return np.union1d(strata, outliers)
+
+class OLSPage(StatsModels):
+
+    #TODO: refactor plotting code to another base page or a plotting element
+
+    MEDIUM_FONT = 14
+    LARGE_FONT = 16
+
+    MAX_SCATTER_POINTS = 50_000
+    DIAGNOSTIC_MODE = 'hexbin' #or 'sample' for a thinned scatter above MAX_SCATTER_POINTS
+    HEXBIN_GRIDSIZE = 100
+    PLOT_DPI = 150
+
+    def residual_plot(self, result_name, container=None):
+        res = self.results[result_name]
+        resid = np.asarray(res.resid)
+
+        self.diagnostic_plot(
+            'residual', result_name, np.arange(len(resid)), resid,
+            'Observation', 'Residual', '{} Regression Residuals'.format(result_name), container
+        )
+
+    def fitted_vs_obs_plot(self, result_name, container=None):
+        res = self.results[result_name]
+
+        self.diagnostic_plot(
+            'fitted_vs_obs', result_name, np.asarray(res.fittedvalues), np.asarray(res.model.endog),
+            'Fitted', 'Observed', '{} Observed vs. Fitted Values'.format(result_name), container
+        )
+
+    def fitted_vs_resid_plot(self, result_name, container=None):
+        res = self.results[result_name]
+
+        self.diagnostic_plot(
+            'fitted_vs_resid', result_name, np.asarray(res.fittedvalues), np.asarray(res.resid),
+            'Fitted', 'Residual', '{} Residuals vs. Fitted Values'.format(result_name), container
+        )
+
+    def resid_qq_plot(self, result_name, container=None):
+        res = self.results[result_name]
+        resid = pd.Series(np.asarray(res.resid, dtype=np.float64), name='resid')
+
+        #NOTE: thinned to a grid of quantiles that keeps both tails, see plotting.qq_points
+        points, _ = qq_points(resid.to_frame())
+        z_osr = (points['osr'].to_numpy() - resid.mean()) / resid.std(ddof=2)
+
+        self.diagnostic_plot(
+            'resid_qq', result_name, points['osm'].to_numpy(), z_osr,
+            'Theoretical Quantile', 'Residual', '{} Residual Probability Plot'.format(result_name), container,
+            line=np.linspace(-3, 3, 100), density=False
+        )
+
+    def diagnostic_plot(self, kind, result_name, x, y, xlabel, ylabel, title, container=None, line=None, density=True):
+        '''
+        Scatter :arg: y against :arg: x. Above MAX_SCATTER_POINTS points the plot is a
+        hexbin density (DIAGNOSTIC_MODE 'hexbin', when :arg: density) or a thinned scatter
+        (see thin_points). Plots for a container are rendered once to PNG and kept in
+        the process wide PLOT_CACHE, keyed on a sampled fingerprint of the plotted values,
+        so reruns and other sessions showing the same result do not draw it again.
+        '''
+        def draw(ax):
+            if len(x) <= self.MAX_SCATTER_POINTS:
+                ax.scatter(x, y)
+            elif density and self.DIAGNOSTIC_MODE == 'hexbin':
+                hb = ax.hexbin(x, y, gridsize=self.HEXBIN_GRIDSIZE, bins='log', mincnt=1)
+                ax.figure.colorbar(hb, ax=ax, label='Observations')
+            else:
+                idx = thin_points(x, y, self.MAX_SCATTER_POINTS)
+                ax.scatter(x[idx], y[idx], s=4)
+            if line is not None:
+                ax.plot(line, line, c='r')
+            ax.set_xlabel(xlabel, fontsize=self.MEDIUM_FONT)
+            ax.set_ylabel(ylabel, fontsize=self.MEDIUM_FONT)
+            ax.set_title(title, fontsize=self.LARGE_FONT)
+
+        if container is None:
+            fig, ax = plt.subplots()
+            draw(ax)
+            plt.show()
+            plt.close(fig)
+            return
+
+        key = fingerprint(
+            kind, result_name, x, y, density, self.DIAGNOSTIC_MODE, self.MAX_SCATTER_POINTS,
+            self.HEXBIN_GRIDSIZE, self.MEDIUM_FONT, self.LARGE_FONT, self.PLOT_DPI,
+            sample_rows=FINGERPRINT_SAMPLE_ROWS
+        )
+        png = PLOT_CACHE.get(key)
+        if png is None:
+            #NOTE: a bare Figure is not registered with pyplot, so nothing is left open after rendering
+            fig = Figure()
+            draw(fig.subplots())
+            buffer = BytesIO()
+            fig.savefig(buffer, format='png', dpi=self.PLOT_DPI, bbox_inches='tight')
+            png = buffer.getvalue()
+            PLOT_CACHE.put(key, png)
+        container.image(png)
+
+    def summary(self, result_name, container):
+        res = self.results[result_name]
+
+        container.write(res.summary2())
+
+    def summary_to_dataframes(self, result_name, alpha=0.05) -> List[pd.DataFrame]:
+        '''
+        The three tables of result.summary() as float DataFrames built from the result's
+        attributes: fit statistics, coefficients (z statistics for models with use_t False)
+        and residual diagnostics (empty for models without resid, e.g. Logit).
+        Works on compact results without refitting (unless :arg: alpha is not 0.05).
+        '''
+        result = self.results[result_name]
+        stats = pd.DataFrame({result_name: fit_statistics(result)}, dtype=float)
+        coefs = coefficient_table(result, alpha)
+        diagnostics = pd.DataFrame({result_name: self.residual_diagnostics(result)}, dtype=float)
+        return [stats, coefs, diagnostics]
+
+    @staticmethod
+    def residual_diagnostics(result) -> dict:
+        '''
+        The normality and autocorrelation tests in the last table of an OLS summary, empty
+        for models without residuals (Logit and other discrete models), whose summary has no such table
+        '''
+        if residual_type(result) != 'resid':
+            return {}
+        resid = np.asarray(result.resid, dtype=np.float64)
+        omnibus, omnibus_p = omni_normtest(resid)
+        jb, jb_p, skew, kurtosis = jarque_bera(resid)
+        return {
+            'Omnibus': omnibus,
+            'Prob(Omnibus)': omnibus_p,
+            'Skew': skew,
+            'Kurtosis': kurtosis,
+            'Durbin-Watson': durbin_watson(resid),
+            'Jarque-Bera (JB)': jb,
+            'Prob(JB)': jb_p,
+        }
+
+    def result_to_cds(self, result_name) -> ColumnDataSource:
+        result = self.full_result(result_name)
+
+        residual = pd.Series(np.asarray(residuals(result)), name='{} Residuals'.format(result_name))
+        fitted = pd.Series(np.asarray(result.fittedvalues), name='{} Fitted Values'.format(result_name))
+        observed = pd.Series(result.model.endog, name='{} Observed Values'.format(result_name))
+        factors = pd.DataFrame(result.model.exog, columns=[str(c) for c in result.model.exog_names])
+
+        data = pd.concat([factors, observed, fitted, residual], axis=1)
+        cds = ColumnDataSource(data)
+
+        return cds
@@ -0,0 +1,247 @@
+import sys
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+PANDAS_3 = int(pd.__version__.split('.')[0]) >= 3
+
+FINGERPRINT_SAMPLE_ROWS = 1024 #rows hashed by fingerprint(..., sample_rows=...)
+
+_MISSING = object()
+DEFAULT_TTL = object() #use the cache wide ttl
+
+
+def copy_on_write() -> bool:
+    '''pandas >= 3 always uses copy on write, 2.x only when the host app switched the option on'''
+    return PANDAS_3 or pd.get_option('mode.copy_on_write') is True
+
+def shared_copy(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Copy of a cached frame that shares its buffers until either side is modified. Without
+    copy on write a shallow copy would let writes reach the cache, so it is a deep copy.
+    '''
+    return df.copy(deep=not copy_on_write())
+
+def estimate_size(obj) -> int:
+    '''Best effort size in bytes of a cached value'''
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    nbytes = getattr(obj, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(obj)
+
+
+def sample_positions(n, sample_rows) -> np.ndarray:
+    ''':arg: sample_rows evenly spaced positions of n, including the first and last'''
+    return np.unique(np.linspace(0, n - 1, sample_rows).astype(np.int64))
+
+def column_sums(part) -> np.ndarray:
+    '''Sums of the numeric columns of a frame, series or array, one pass over the data without hashing it'''
+    if isinstance(part, pd.DataFrame):
+        return part.sum(numeric_only=True).to_numpy(np.float64)
+    if isinstance(part, pd.Series):
+        return np.atleast_1d(np.float64(part.sum())) if part.dtype.kind in 'biuf' else np.empty(0)
+    if part.dtype.kind in 'biuf':
+        return np.atleast_1d(np.nansum(part, axis=0, dtype=np.float64))
+    return np.empty(0)
+
+def _update_digest(h, part, sample_rows=None):
+    if sample_rows is not None and isinstance(part, (pd.DataFrame, pd.Series, np.ndarray)) and len(part) > sample_rows:
+        h.update(repr(('sampled', part.shape)).encode())
+        h.update(column_sums(part).tobytes())
+        positions = sample_positions(len(part), sample_rows)
+        part = part[positions] if isinstance(part, np.ndarray) else part.iloc[positions]
+
+    if isinstance(part, (pd.DataFrame, pd.Series, pd.Index)):
+        h.update(repr((type(part).__name__, part.shape, getattr(part, 'name', None))).encode())
+        if isinstance(part, pd.DataFrame):
+            h.update(repr([(str(c), str(t)) for c, t in part.dtypes.items()]).encode())
+        else:
+            h.update(str(part.dtype).encode())
+        h.update(pd.util.hash_pandas_object(part, index=not isinstance(part, pd.Index)).values.tobytes())
+    elif isinstance(part, np.ndarray):
+        h.update(repr((part.dtype.str, part.shape)).encode())
+        if part.dtype.kind == 'O':
+            h.update(pd.util.hash_pandas_object(pd.Series(part.ravel()), index=False).values.tobytes())
+        else:
+            h.update(np.ascontiguousarray(part).reshape(-1).view(np.uint8).data)
+    elif isinstance(part, dict):
+        h.update(b'{')
+        for k in sorted(part, key=repr):
+            _update_digest(h, k)
+            _update_digest(h, part[k], sample_rows)
+        h.update(b'}')
+    elif isinstance(part, (list, tuple)):
+        h.update(b'[')
+        for p in part:
+            _update_digest(h, p, sample_rows)
+        h.update(b']')
+    else:
+        h.update(repr(part).encode())
+    h.update(b'|')
+
+def fingerprint(*parts, sample_rows=None) -> str:
+    '''
+    Content hash of arrays, frames and plain values (hashed by repr, recursing into
+    dicts, lists and tuples). Arrays are hashed in full, which is memory bandwidth bound.
+
+    With :arg: sample_rows, longer arrays and frames are fingerprinted by their shape,
+    dtypes, the sums of their numeric columns and a hash of :arg: sample_rows evenly
+    spaced rows only, which is cheap enough to run on every rerun. An edit that keeps
+    every column sum and misses the sampled rows is not seen, so only use it to key
+    values that are safe to serve slightly stale, e.g. figures.
+    '''
+    h = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        _update_digest(h, part, sample_rows)
+    return h.hexdigest()
+
+
+class CacheStats:
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self):
+        return dict(vars(self), hit_rate=self.hit_rate)
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(self.__class__.__name__, ', '.join('{}={}'.format(k, v) for k, v in vars(self).items()))
+
+
+class LRUCache:
+
+    '''
+    Thread safe least recently used cache meant to be shared by every session on the process.
+
+    Entries expire :arg: ttl seconds after they were stored (None keeps them until
+    evicted). When the total :arg: sizeof of all entries exceeds :arg: max_bytes, or
+    there are more than :arg: max_entries, the least recently used entries are evicted
+    and passed to :arg: on_evict(key, value, expires) if given, e.g. to spill them to disk.
+    '''
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        sizeof: Callable[[Any], int] = estimate_size,
+        on_evict: Optional[Callable[[Hashable, Any, Optional[float]], None]] = None
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.stats = CacheStats()
+        self._entries = OrderedDict() # key -> (value, size, expires)
+        self._nbytes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.stats.misses += 1
+                return default
+            self.stats.hits += 1
+            return value
+
+    def put(self, key, value, ttl=DEFAULT_TTL):
+        '''Store :arg: value, :arg: ttl overrides the cache wide default for this entry'''
+        ttl = self.ttl if ttl is DEFAULT_TTL else ttl
+        expires = None if ttl is None else time.monotonic() + ttl
+        size = self.sizeof(value)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size, expires)
+            self._nbytes += size
+            evicted = self._evict()
+
+        self._notify(evicted)
+
+    def get_or_set(self, key, func: Callable[[], Any], ttl=DEFAULT_TTL):
+        '''Return the cached value for :arg: key, computing and storing func() on a miss'''
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = func()
+            self.put(key, value, ttl)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            self._remove(key)
+        return default if value is _MISSING else value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+
+        value, _, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            self._remove(key)
+            return _MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry[1]
+
+    def _evict(self):
+        evicted = []
+        while self._entries and (
+            (self.max_bytes is not None and self._nbytes > self.max_bytes) or
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            key, (value, size, expires) = self._entries.popitem(last=False)
+            self._nbytes -= size
+            self.stats.evictions += 1
+            evicted.append((key, value, expires))
+        return evicted
+
+    def _notify(self, evicted):
+        if self.on_evict is None:
+            return
+        for key, value, expires in evicted:
+            self.on_evict(key, value, expires)
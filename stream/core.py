@@ -1,10 +1,11 @@
 import streamlit as st
-from typing import Any, Dict, List, Hashable, Union
+from copy import copy
+from typing import Any, Callable, Dict, List, Hashable, Optional, Union
 from treelib import Tree, Node
-from pandas import DataFrame
-from bt import Strategy, Backtest
 from numpy.random import randn
 
+from .jobs import DONE, FAILED, JOBS, PENDING, RUNNING, Job, JobScheduler
+
 class Element:
 
     def __init__(self, name=None, pass_data_to_parent=False) -> None:
@@ -31,19 +32,56 @@ class Page(Node):
     def save_obj_from_widget_key(self, key):
         val = st.session_state[key]
 
+    @property
+    def jobs(self) -> Dict[str, Job]:
+        '''Handles of background jobs submitted for this page, see :meth: Session.submit'''
+        if 'jobs' not in self.data:
+            self.data['jobs'] = {}
+        return self.data['jobs']
+
 
     def __call__(self, *args, **kwargs):
         raise NotImplementedError
 
 
+def shallow_page_copy(node: Page) -> Page:
+    '''Copy a page's tree pointers and top level :dict: data, sharing the stored values'''
+    new_node = copy(node)
+    new_node._predecessor = dict(node._predecessor)
+    new_node._successors = {k: list(v) for k, v in node._successors.items()}
+    if isinstance(node.data, dict):
+        new_node.data = dict(node.data)
+    return new_node
+
+def page_unchanged(node: Page, persisted: Page) -> bool:
+    '''Check tag, tree pointers and identity of every top level value in :dict: data'''
+    if persisted is None:
+        return False
+    if node.tag != persisted.tag:
+        return False
+    if node._predecessor != persisted._predecessor or node._successors != persisted._successors:
+        return False
+
+    data, persisted_data = node.data, persisted.data
+    if not (isinstance(data, dict) and isinstance(persisted_data, dict)):
+        return data is persisted_data
+    if data.keys() != persisted_data.keys():
+        return False
+    return all(v is persisted_data[k] for k, v in data.items())
+
+
 class Session(Tree):
 
-    def __init__(self, name=None, start_page=None, debug_mode=False, **global_vars) -> None:
+    #NOTE: class level and process wide, a Session is rebuilt on every rerun but its jobs must keep running
+    scheduler: JobScheduler = JOBS
+
+    def __init__(self, name=None, start_page=None, debug_mode=False, copy_on_write=False, **global_vars) -> None:
         self._name = name or self.__class__.__name__
         self._globals = global_vars
         self._next_page_key = '{}_next_page'.format(self._name)
         self._debug_mode = debug_mode
         self._start_page = start_page
+        self._copy_on_write = copy_on_write
 
     @property
     def active_page(self) -> Page:
@@ -70,7 +108,12 @@ class Session(Tree):
 
         if self._name in st.session_state:
             tree = st.session_state[self._name]['locals']
-            super().__init__(tree, True, Page, self._name)
+            if self._copy_on_write:
+                super().__init__(node_class=Page, identifier=self._name)
+                self.root = tree.root
+                self._nodes = {nid: shallow_page_copy(node) for nid, node in tree.nodes.items()}
+            else:
+                super().__init__(tree, True, Page, self._name)
 
             self._active_page_id = st.session_state[self._name]['active_page']
 
@@ -87,7 +130,7 @@ class Session(Tree):
         if page_id is not None:
             self._active_page_id = page_id
 
-        st.session_state[self._name]['locals'] = Tree(self, True, Page, self._name)
+        st.session_state[self._name]['locals'] = self.snapshot()
         st.session_state[self._name]['active_page'] = self._active_page_id
 
         page_options = self.children(self._active_page_id)
@@ -105,6 +148,68 @@ class Session(Tree):
 
         st.session_state[self._name]['page_options'] = page_options
 
+    def snapshot(self) -> Tree:
+        '''
+        Copy of the page tree to persist in st.session_state.
+
+        The default deep copies every page, including everything held in its data.
+        With copy_on_write, pages share their stored values with the session and only
+        pages whose tag, position or top level data changed since the last snapshot
+        are copied again. Values mutated in place are therefore shared, not isolated.
+        '''
+        if not self._copy_on_write:
+            return Tree(self, True, Page, self._name)
+
+        previous = st.session_state[self._name].get('locals')
+        persisted = previous.nodes if previous is not None else {}
+
+        snapshot = Tree(node_class=Page, identifier=self._name)
+        snapshot.root = self.root
+        for nid, node in self.nodes.items():
+            old = persisted.get(nid)
+            snapshot._nodes[nid] = old if page_unchanged(node, old) else shallow_page_copy(node)
+        return snapshot
+
+    def submit(self, name, fn: Callable, *args, page: Optional[Page] = None, use_processes=False, resubmit=False, **kwargs) -> Job:
+        '''
+        Run fn(*args, **kwargs) in the background (in a worker process with :arg: use_processes)
+        and keep its handle in the jobs of :arg: page (the active page by default) under :arg: name.
+
+        Page code runs again on every rerun, so while a job of that name is pending,
+        running, done or failed it is returned instead of starting another, so page code
+        can show its result or error, unless :arg: resubmit (which cancels the previous run).
+        Cancelled jobs are submitted again.
+
+        :arg: fn must return its result and never modify page data (so no methods of the
+        page that store their results, like Bt.run_backtest). It runs in a pool thread while
+        the script copies page data, and its writes would land on a page object the next
+        rerun replaces. Store the value from the script once the job is done, e.g.
+
+            job = session.submit('backtests', run_backtests, bkts, processes=4, page=page)
+            if job.done():
+                page.store_backtests(job.result())
+        '''
+        page = self.active_page if page is None else page
+        job = page.jobs.get(name)
+        if job is not None and not resubmit and job.status in (PENDING, RUNNING, DONE, FAILED):
+            return job
+        if job is not None:
+            job.cancel()
+
+        job = self.scheduler.submit(name, fn, *args, use_processes=use_processes, **kwargs)
+        page.jobs[name] = job
+        return job
+
+    def poll(self, page: Optional[Page] = None) -> Dict[str, str]:
+        '''Status of every job of :arg: page (the active page by default)'''
+        page = self.active_page if page is None else page
+        return {name: job.status for name, job in page.jobs.items()}
+
+    def cancel(self, name, page: Optional[Page] = None) -> bool:
+        page = self.active_page if page is None else page
+        job = page.jobs.get(name)
+        return job.cancel() if job is not None else False
+
     def run(self):
 
         self.sidebar()
@@ -1,12 +1,34 @@
 #%%
-from typing import Iterable, Union
+from typing import Dict, Iterable, Union
 from .core import Element
+from .plotting import POINTS_PER_PIXEL, DownsampledSource
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
 
 import bokeh.plotting as bkp
 from bokeh.models import ColumnDataSource, HoverTool
 import bokeh.palettes
 
+def source_data(df: DataFrame) -> Dict[str, np.ndarray]:
+    '''
+    The columns ColumnDataSource(df) would hold (the index and every column under its
+    str name) as arrays viewing :arg: df's own buffers where its dtypes allow, instead
+    of copying the frame to rename its columns.
+    '''
+    data = {str(df.index.name or 'index'): df.index.to_numpy()}
+    for i, c in enumerate(df.columns):
+        data[str(c)] = df.iloc[:, i].to_numpy()
+    return data
+
+def changed_rows(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    '''Positions where two equal length arrays differ, missing values in both count as equal'''
+    differ = np.asarray(old != new, dtype=bool)
+    if differ.any():
+        differ &= ~(pd.isna(old) & pd.isna(new))
+    return np.flatnonzero(differ)
+
+
 class BokehPlot:
 
     def __init__(
@@ -15,9 +37,13 @@ class BokehPlot:
         height=400,
         width=600,
         color='viridis',
-        ttips=None
+        ttips=None,
+        rollover=None
     ) -> None:
-        self._data = data
+        self.rollover = rollover #most rows kept by the source, see append
+        self._data = data if rollover is None else data.iloc[-rollover:]
+        self._source = None
+        self._samplers = [] #DownsampledSources of figures made by line
         self.height = height
         self.width = width
         self.color_func = getattr(bokeh.palettes, color)
@@ -25,9 +51,60 @@ class BokehPlot:
 
     @property
     def data(self) -> ColumnDataSource:
-        d = self._data.copy()
-        d.columns = d.columns.astype(str)
-        return ColumnDataSource(d)
+        '''Source of every figure of this plot, built from the frame on first access'''
+        if self._source is None:
+            self._source = ColumnDataSource(source_data(self._data))
+        return self._source
+
+    def update(self, data: DataFrame):
+        '''
+        Plot :arg: data instead. Once the source exists, only the difference is sent:
+        values that changed in the rows already plotted are patched and rows added at the
+        end are streamed. A frame with other columns or fewer rows replaces the source data.
+        With a rollover, use append for live data: rows dropped at the start change the
+        plotted rows, so update would replace the source data.
+        '''
+        if self.rollover is not None:
+            data = data.iloc[-self.rollover:]
+        n, self._data = len(self._data), data
+        self._resample()
+        if self._source is None:
+            return
+
+        source = self._source
+        new = source_data(data)
+        if list(new) != list(source.data) or len(data) < n or any(len(v) != n for v in source.data.values()):
+            source.data = new
+            return
+
+        patches = {}
+        for name, values in new.items():
+            rows = changed_rows(source.data[name], values[:n])
+            if len(rows):
+                patches[name] = [(slice(int(rows[0]), int(rows[-1]) + 1), values[rows[0]:rows[-1] + 1])]
+        if patches:
+            for name in patches:
+                current = source.data[name]
+                if isinstance(current, np.ndarray) and not current.flags.writeable:
+                    #NOTE: read only views of the frame are copied before bokeh patches them in place,
+                    #bypassing change events since the browser already holds these values
+                    dict.__setitem__(source.data, name, current.copy())
+            source.patch(patches)
+
+        if len(data) > n:
+            source.stream({name: values[n:] for name, values in new.items()})
+
+    def append(self, rows: DataFrame):
+        '''
+        Add :arg: rows after the plotted ones. They are streamed to the source, which keeps
+        at most :arg: rollover rows, so a live plot refreshed with only its new rows sends
+        just those and holds a bounded history.
+        '''
+        data = pd.concat([self._data, rows])
+        self._data = data if self.rollover is None else data.iloc[-self.rollover:]
+        self._resample()
+        if self._source is not None:
+            self._source.stream(source_data(rows), self.rollover)
 
     def default_figure(self, datetime_x=False, ttips=None):
         fig_kwargs = {
@@ -60,7 +137,22 @@ class BokehPlot:
             figure.title.text_font_size = '16pt'
         return figure
 
-    def line(self, x: str='index', y: Union[str, Iterable[str]]=None, fig=None, time_series=False):
+    def _str_columns(self) -> DataFrame:
+        '''The frame with the str column names used by the sources, without copying it'''
+        return self._data.set_axis([str(c) for c in self._data.columns], axis=1)
+
+    def _resample(self):
+        for sampler in self._samplers:
+            sampler.set_frame(self._str_columns()[list(sampler.frame.columns)])
+
+    def line(self, x: str='index', y: Union[str, Iterable[str]]=None, fig=None, time_series=False, downsample=True, method='minmax', requery=False):
+        '''
+        Lines of :arg: y against :arg: x. Against the index, frames longer than
+        POINTS_PER_PIXEL points per pixel of the figure's width are downsampled per
+        series (see plotting.DownsampledSource) unless :arg: downsample is False, and with
+        :arg: requery re-sampled on zoom in bokeh server documents. update and append
+        re-sample them too.
+        '''
         if fig is None:
             fig = self.default_figure(time_series, ttips=self.ttips)
 
@@ -69,14 +161,22 @@ class BokehPlot:
         elif isinstance(y, (Iterable)):
             y_list = y
         elif y is None:
-            y_list = list(self._data.columns)
+            y_list = [str(c) for c in self._data.columns]
 
-        src = self.data
+        max_points = POINTS_PER_PIXEL * fig.width
+        if downsample and x == 'index' and len(self._data) > max_points:
+            sampler = DownsampledSource(self._str_columns()[list(y_list)], max_points=max_points, method=method)
+            if requery:
+                sampler.attach(fig)
+            self._samplers.append(sampler)
+            src, x_column = sampler.source, sampler.x_column
+        else:
+            src, x_column = self.data, lambda yl: x
         colors = self.color_func(len(y_list))
 
         for yl, color in zip(y_list, colors):
 
-            fig.line(x=x, y=yl, source=src, color=color, legend_label=yl)
+            fig.line(x=x_column(yl), y=yl, source=src, color=color, legend_label=yl)
         return fig
 
     def scatter(self, x, y, fig=None):
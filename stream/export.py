@@ -0,0 +1,70 @@
+'''
+Serializing DataFrames for download.
+
+Every exporter takes the frame and returns the file's bytes, so pages can hand
+them to st.download_button as callables and only pay for the export when the
+user actually clicks.
+'''
+from io import BytesIO
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+import streamlit as st
+import xlsxwriter
+
+CHUNK_ROWS = 10_000
+
+#NOTE: st.download_button accepts a callable for data from streamlit 1.52
+LAZY_DOWNLOADS = tuple(int(v) for v in st.__version__.split('.')[:2]) >= (1, 52)
+
+def to_xlsx(df: pd.DataFrame, sheet_name='Sheet1', index=True) -> bytes:
+    '''
+    Write with xlsxwriter in constant_memory mode, which flushes each row to a
+    temporary file once it is written instead of keeping every cell in memory.
+    Rows are written in order a chunk at a time (pandas' own writer goes column by
+    column, which constant_memory does not allow).
+    '''
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'remove_timezone': True,
+        'strings_to_urls': False,
+    })
+    sheet = workbook.add_worksheet(sheet_name)
+    bold = workbook.add_format({'bold': True})
+
+    header = [str(c) if not isinstance(c, tuple) else ':'.join(map(str, c)) for c in df.columns]
+    if index:
+        header = [':'.join(str(n) for n in df.index.names if n is not None)] + header
+    sheet.write_row(0, 0, header, bold)
+
+    row = 1
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for record in values.itertuples(index=index, name=None):
+            if index and isinstance(record[0], tuple):
+                record = (':'.join(map(str, record[0])),) + record[1:]
+            sheet.write_row(row, 0, record)
+            row += 1
+
+    workbook.close()
+    return output.getvalue()
+
+def to_parquet(df: pd.DataFrame, index=True) -> bytes:
+    output = BytesIO()
+    df.to_parquet(output, index=index)
+    return output.getvalue()
+
+def to_csv_gz(df: pd.DataFrame, index=True, compresslevel=5) -> bytes:
+    output = BytesIO()
+    df.to_csv(output, index=index, compression={'method': 'gzip', 'compresslevel': compresslevel})
+    return output.getvalue()
+
+#format -> (exporter, file extension, mime type)
+EXPORTERS: Dict[str, Tuple[Callable[..., bytes], str, str]] = {
+    'xlsx': (to_xlsx, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': (to_parquet, 'parquet', 'application/octet-stream'),
+    'csv.gz': (to_csv_gz, 'csv.gz', 'application/gzip'),
+}
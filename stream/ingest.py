@@ -0,0 +1,104 @@
+'''
+Reading uploaded files into compact DataFrames.
+
+Each format goes through the fastest reader available: pyarrow's multithreaded
+CSV reader, pyarrow for Parquet and Feather, and calamine for Excel when the
+python-calamine package is installed (pandas' openpyxl reader, which streams the
+workbook in read only mode, otherwise).
+'''
+import os
+from importlib.util import find_spec
+import numpy as np
+import pandas as pd
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from typing import Tuple
+
+EXCEL_ENGINE = 'calamine' if find_spec('python_calamine') else 'openpyxl'
+
+FORMATS = {
+    'csv': 'csv',
+    'txt': 'csv',
+    'parquet': 'parquet',
+    'pq': 'parquet',
+    'feather': 'feather',
+    'arrow': 'feather',
+    'xlsx': 'excel',
+    'xlsm': 'excel',
+}
+UPLOAD_TYPES = list(FORMATS)
+CATEGORY_RATIO = 0.5 #convert text columns with fewer unique values than this share of rows
+
+
+def file_format(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lstrip('.').lower()
+    if ext not in FORMATS:
+        raise Exception("Unsupported file type '{}', expected one of {}".format(ext, UPLOAD_TYPES))
+    return FORMATS[ext]
+
+def read_file(file, filename=None, fmt=None) -> pd.DataFrame:
+    '''Read a path or file like object (e.g. a streamlit UploadedFile) into a DataFrame'''
+    filename = filename or getattr(file, 'name', file)
+    fmt = fmt or file_format(str(filename))
+
+    if fmt == 'csv':
+        return pa_csv.read_csv(file).to_pandas()
+    if fmt == 'parquet':
+        return pq.read_table(file).to_pandas()
+    if fmt == 'feather':
+        return feather.read_table(file).to_pandas()
+    if fmt == 'excel':
+        return pd.read_excel(file, engine=EXCEL_ENGINE)
+    raise Exception("Unsupported format '{}'".format(fmt))
+
+def downcast_floats(col: pd.Series) -> pd.Series:
+    '''float64 to float32 only when every value survives the round trip'''
+    small = col.astype(np.float32)
+    if np.array_equal(small.to_numpy(np.float64), col.to_numpy(np.float64), equal_nan=True):
+        return small
+    return col
+
+def compact_dtypes(df: pd.DataFrame, category_ratio=CATEGORY_RATIO) -> pd.DataFrame:
+    '''
+    Smallest lossless dtypes per column: integers downcast to the narrowest
+    (unsigned where possible) type, floats to float32 when exact, and repetitive
+    text columns to categoricals.
+    '''
+    out = {}
+    n = len(df)
+    for i, (_, col) in enumerate(df.items()):
+        kind = col.dtype.kind
+        if kind in 'iu':
+            downcast = 'unsigned' if (n and col.min() >= 0) else 'integer'
+            col = pd.to_numeric(col, downcast=downcast)
+        elif kind == 'f' and col.dtype.itemsize > 4:
+            col = downcast_floats(col)
+        elif (kind == 'O' or isinstance(col.dtype, pd.StringDtype)) and n:
+            try:
+                if col.nunique(dropna=False) <= category_ratio * n:
+                    col = col.astype('category')
+            except TypeError: #unhashable cells
+                pass
+        out[i] = col
+
+    compact = pd.DataFrame(out, index=df.index)
+    compact.columns = df.columns
+    return compact
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    '''Per column dtype and size in bytes before and after compact_dtypes'''
+    report = pd.DataFrame({
+        'dtype': after.dtypes.astype(str),
+        'parsed dtype': before.dtypes.astype(str),
+        'bytes': after.memory_usage(index=False, deep=True),
+        'parsed bytes': before.memory_usage(index=False, deep=True),
+    })
+    report.loc['Total'] = ['', '', report['bytes'].sum(), report['parsed bytes'].sum()]
+    return report
+
+def ingest(file, filename=None, fmt=None, compact=True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    '''read_file followed by compact_dtypes, returns the frame and its memory_report'''
+    parsed = read_file(file, filename, fmt)
+    df = compact_dtypes(parsed) if compact else parsed
+    return df, memory_report(parsed, df)
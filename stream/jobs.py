@@ -0,0 +1,162 @@
+'''
+Background jobs that outlive streamlit reruns.
+
+The pools belong to the process rather than to a Session (which is rebuilt on
+every rerun), so a job keeps running while the script is stopped and restarted,
+and a later rerun picks up its result from the handle stored in the page's data.
+'''
+import inspect
+import os
+import threading
+import time
+import uuid
+import multiprocessing as mp
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+THREAD_WORKERS = 4
+PROCESS_WORKERS = os.cpu_count() or 1
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job:
+
+    '''
+    Handle to a function running in a :class: JobScheduler pool.
+
+    Handles are shared rather than copied (including by Session's deep copies), so the
+    one stored in a page's data keeps tracking the same run across reruns.
+    '''
+
+    def __init__(self, name: str, future: Future, cancel_event=None) -> None:
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.future = future
+        self.cancel_event = cancel_event
+        self.submitted = time.time()
+        self.finished = None
+        future.add_done_callback(self._finish)
+
+    def _finish(self, future):
+        self.finished = time.time()
+
+    @property
+    def status(self) -> str:
+        if self.future.cancelled() or (self.cancel_event is not None and self.cancel_event.is_set()):
+            return CANCELLED
+        if self.future.done():
+            return FAILED if self.future.exception() is not None else DONE
+        return RUNNING if self.future.running() else PENDING
+
+    @property
+    def elapsed(self) -> float:
+        '''Seconds since submission, or until the job finished'''
+        return (self.finished or time.time()) - self.submitted
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout=None) -> Any:
+        '''The function's return value, waits up to :arg: timeout seconds (None waits until done)'''
+        return self.future.result(timeout)
+
+    def exception(self, timeout=None) -> Optional[BaseException]:
+        return self.future.exception(timeout)
+
+    def cancel(self) -> bool:
+        '''
+        Cancel the job. A queued job never starts. A running job is asked to stop through
+        the cancel event passed to functions taking a :arg: cancel argument (e.g.
+        backtest.run_backtests), other running jobs are left to finish.
+        '''
+        if self.future.cancel():
+            return True
+        if self.cancel_event is not None and not self.future.done():
+            self.cancel_event.set()
+            return True
+        return False
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return '{}({!r}, {}, {:.1f}s)'.format(self.__class__.__name__, self.name, self.status, self.elapsed)
+
+
+class JobScheduler:
+
+    '''
+    Thread and process pools for background jobs, created on first use.
+
+    Thread jobs suit work that releases the GIL or waits on IO (queries, numpy heavy
+    fits). Process jobs run in spawned workers, so the function and its arguments must
+    be picklable. Jobs do not run in the script thread: they must not write to streamlit
+    containers, and they must return their results rather than write them to page data.
+    The script copies page data while jobs run, and the page object a bound method
+    writes to is replaced on the next rerun. Collect the value with Job.result() instead.
+    '''
+
+    def __init__(self, thread_workers=THREAD_WORKERS, process_workers=PROCESS_WORKERS) -> None:
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def executor(self, use_processes=False) -> Executor:
+        with self._lock:
+            if use_processes:
+                if self._processes is None:
+                    self._processes = ProcessPoolExecutor(self.process_workers, mp_context=mp.get_context('spawn'))
+                return self._processes
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.thread_workers, thread_name_prefix='stream-job')
+            return self._threads
+
+    def cancel_event(self, use_processes=False):
+        '''A threading.Event, or for process jobs an Event proxy of a manager process started on first use'''
+        if not use_processes:
+            return threading.Event()
+        with self._lock:
+            if self._manager is None:
+                self._manager = mp.get_context('spawn').Manager()
+            return self._manager.Event()
+
+    def submit(self, name: str, fn: Callable, *args, use_processes=False, **kwargs) -> Job:
+        '''
+        Run fn(*args, **kwargs) in the background, in a worker process with :arg: use_processes.
+        Functions taking a :arg: cancel argument that was not given are passed an event
+        set by Job.cancel.
+        '''
+        cancel_event = None
+        if 'cancel' not in kwargs and accepts_cancel(fn):
+            cancel_event = kwargs['cancel'] = self.cancel_event(use_processes)
+        future = self.executor(use_processes).submit(fn, *args, **kwargs)
+        return Job(name, future, cancel_event)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self._lock:
+            for pool in (self._threads, self._processes):
+                if pool is not None:
+                    pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+            if self._manager is not None:
+                self._manager.shutdown()
+            self._threads = self._processes = self._manager = None
+
+def accepts_cancel(fn: Callable) -> bool:
+    try:
+        return 'cancel' in inspect.signature(fn).parameters
+    except (TypeError, ValueError): #builtins without a signature
+        return False
+
+#NOTE: process wide so jobs survive the Session being rebuilt on every rerun
+JOBS = JobScheduler()
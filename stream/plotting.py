@@ -4,10 +4,17 @@ import numpy as np
 import bokeh as bok
 import bokeh.plotting as bkp
 import bokeh.models as bkm
+from bokeh.document import Document
+from bokeh.events import RangesUpdate
+from bokeh.layouts import column, gridplot
+import functools
+import inspect
 import itertools
 from bokeh.palettes import Magma11
 import scipy.stats as ss
-from statsmodels.tsa.stattools import acf
+from scipy.fft import irfft, next_fast_len, rfft
+
+from .cache import FINGERPRINT_SAMPLE_ROWS, LRUCache, estimate_size, fingerprint
 
 
 HEIGHT = 400
@@ -16,6 +23,9 @@ TOOLBAR_LOC = 'below'
 SIZING_MODE = 'stretch_both'
 colors = itertools.cycle(Magma11)
 
+FIGURE_CACHE_BYTES = 256 * 2**20
+MODEL_BYTES = 1024 #rough size of a bokeh model besides its column data
+
 def default_figure(datetime_x=False, ttips=None):
     fig_kwargs = {
         'height': HEIGHT,
@@ -48,118 +58,648 @@ def bkformat(figure, xlabel=None, ylabel=None, title=None):
         figure.title.text_font_size = '16pt'
     return figure
 
+DATE_COLUMN = '__date'
+
+def series_name(c) -> str:
+    #in case dframe has multi-index columns
+    return ':'.join(map(str, c)) if isinstance(c, tuple) else str(c)
+
+def band_columns(name) -> tuple:
+    return '{} upper'.format(name), '{} lower'.format(name)
+
+def figure_size(fig) -> int:
+    '''Bytes of a bokeh model with the column data of its sources'''
+    sources = fig.select({'type': bkm.ColumnDataSource})
+    data = sum(estimate_size(v) for src in sources for v in src.data.values())
+    return data + MODEL_BYTES * len(fig.references())
+
+
+class CachedFigure:
+
+    '''
+    Serialized document of a built figure. Bokeh models belong to one document and are
+    modified in place, so sessions never share one: every load() builds new models.
+    '''
+
+    def __init__(self, fig) -> None:
+        self.nbytes = figure_size(fig)
+        doc = Document()
+        doc.add_root(fig)
+        self.doc_json = doc.to_json()
+        doc.remove_root(fig)
+
+    def load(self):
+        doc = Document.from_json(self.doc_json)
+        fig = doc.roots[0]
+        doc.remove_root(fig) #so it can be added to the caller's document
+        return fig
+
+def cache_size(value) -> int:
+    return len(value) if isinstance(value, (bytes, bytearray)) else estimate_size(value)
+
+#NOTE: process wide, CachedFigures of cached_figure functions and PNGs rendered by OLSPage
+FIGURE_CACHE = LRUCache(max_bytes=FIGURE_CACHE_BYTES, sizeof=cache_size)
+
+def cached_figure(func):
+    '''
+    Serve repeated calls of a plotting function from FIGURE_CACHE, keyed on the function,
+    its arguments and a sampled fingerprint of its frames (see cache.fingerprint), so a
+    rerun with the same data and arguments skips computing the figure. Each call gets
+    its own figure, rebuilt from the cached document (see :class: CachedFigure).
+
+    Calls drawing on a given :arg: fig, with python callbacks (:arg: requery), which are
+    not serialized, or with cache=False are not cached.
+    '''
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def cached(*args, cache=True, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if not cache or bound.arguments.get('fig') is not None or bound.arguments.get('requery'):
+            return func(*args, **kwargs)
+
+        key = fingerprint(func.__module__, func.__qualname__, bound.arguments, sample_rows=FINGERPRINT_SAMPLE_ROWS)
+        cached_fig = FIGURE_CACHE.get(key)
+        if cached_fig is not None:
+            return cached_fig.load()
+        fig = func(*args, **kwargs)
+        FIGURE_CACHE.put(key, CachedFigure(fig))
+        return fig
+    return cached
+
+def time_series_source_data(dframe: pd.DataFrame, upper_bound: pd.DataFrame = None, lower_bound: pd.DataFrame = None) -> dict:
+    '''
+    Wide columns of the source shared by every glyph of :func: time_series: the dates,
+    one column per series named after it and, with bounds, an upper and a lower column
+    per series aligned to the dates. Numeric columns are views of the frames' buffers.
+    '''
+    data = {DATE_COLUMN: pd.DatetimeIndex(dframe.index).to_numpy()}
+    for i, c in enumerate(dframe.columns):
+        name = series_name(c)
+        data[name] = dframe.iloc[:, i].to_numpy()
+        if upper_bound is not None and lower_bound is not None:
+            upper, lower = band_columns(name)
+            data[upper] = upper_bound[c].reindex(dframe.index).to_numpy()
+            data[lower] = lower_bound[c].reindex(dframe.index).to_numpy()
+    return data
+
+POINTS_PER_PIXEL = 2 #points kept per series for every pixel of figure width when downsampling
+DOWNSAMPLE_COLUMNS = 16 #series reduced at a time, bounds the temporary arrays
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    '''
+    (m, ncols) row positions keeping the minimum and the maximum of every column in each of
+    n_out // 2 buckets of rows, in row order, so no spike is lost. NaN are skipped, a bucket
+    that is all NaN keeps a NaN (a gap in the line).
+    '''
+    n, ncols = y.shape
+    if n <= n_out:
+        return np.broadcast_to(np.arange(n)[:, None], (n, ncols))
+    buckets = max(n_out // 2, 1)
+    size = -(-n // buckets)
+    starts = (np.arange(buckets) * size)[:, None]
+
+    idx = np.empty((2 * buckets, ncols), dtype=np.int64)
+    for j in range(0, ncols, DOWNSAMPLE_COLUMNS):
+        block = np.full((buckets * size, min(DOWNSAMPLE_COLUMNS, ncols - j)), np.nan)
+        block[:n] = y[:, j:j + DOWNSAMPLE_COLUMNS]
+        block = block.reshape(buckets, size, -1)
+        nan = np.isnan(block)
+        low = starts + np.where(nan, np.inf, block).argmin(axis=1)
+        high = starts + np.where(nan, -np.inf, block).argmax(axis=1)
+        idx[0::2, j:j + block.shape[2]] = np.minimum(low, high)
+        idx[1::2, j:j + block.shape[2]] = np.maximum(low, high)
+    return np.minimum(idx, n - 1)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    '''
+    Row positions of the Largest-Triangle-Three-Buckets reduction of one series to
+    :arg: n_out points. NaN are skipped, and the result is padded with its last position
+    so every series of a source has the same length.
+    '''
+    valid = np.flatnonzero(~np.isnan(y))
+    x, y = x[valid], y[valid]
+    n = len(valid)
+    if n <= n_out:
+        keep = np.arange(n)
+    elif n_out < 3:
+        keep = np.array([0, n - 1])[:n_out]
+    else:
+        edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+        keep = np.empty(n_out, dtype=np.int64)
+        keep[0], keep[-1] = 0, n - 1
+        a = 0
+        for i in range(n_out - 2):
+            lo, hi = edges[i], edges[i + 1]
+            next_hi = edges[i + 2] if i + 2 < len(edges) else n
+            avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+            area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+            a = lo + int(area.argmax())
+            keep[i + 1] = a
+    keep = valid[keep] if n else np.zeros(1, dtype=np.int64)
+    return np.pad(keep, (0, n_out - len(keep)), mode='edge')
+
+
+class DownsampledSource:
+
+    '''
+    ColumnDataSource of the series of :arg: dframe reduced to about :arg: max_points
+    points each, by min/max decimation or LTTB (:arg: method 'minmax' or 'lttb'), with
+    their confidence bounds taken at the same rows. The kept rows differ per series, so
+    each series has its own x column, named by :meth: x_column.
+
+    attach(fig) re-samples the visible x range whenever the figure is zoomed or panned
+    (a RangesUpdate event), so every render sends a bounded number of points at the
+    resolution of the view. Python callbacks only run in bokeh server documents, static
+    embeds (st.bokeh_chart) keep the downsampled overview and should not attach.
+    '''
+
+    def __init__(self, dframe: pd.DataFrame, upper_bound=None, lower_bound=None, max_points=POINTS_PER_PIXEL * WIDTH, method='minmax') -> None:
+        self.max_points = max_points
+        self.method = method
+        self.source = None
+        self.set_frame(dframe, upper_bound, lower_bound)
+
+    @staticmethod
+    def x_column(name) -> str:
+        return '{} x'.format(name)
+
+    def set_frame(self, dframe: pd.DataFrame, upper_bound=None, lower_bound=None):
+        '''Downsample :arg: dframe instead, e.g. after new rows arrived'''
+        self.frame = dframe
+        bands = upper_bound is not None and lower_bound is not None
+        self.upper = upper_bound.reindex(dframe.index) if bands else None
+        self.lower = lower_bound.reindex(dframe.index) if bands else None
+        index = dframe.index
+        self.x = index.to_numpy()
+        #positions comparable to bokeh's range values, which are ms since the epoch on datetime axes
+        if isinstance(index, pd.DatetimeIndex):
+            self.positions = index.as_unit('ns').asi8 / 1e6
+        else:
+            self.positions = index.to_numpy(np.float64)
+
+        data = self.sample()
+        if self.source is None:
+            self.source = bkm.ColumnDataSource(data)
+        else:
+            self.source.data = data
+
+    def sample(self, start=None, end=None) -> dict:
+        '''Downsampled columns of the rows between :arg: start and :arg: end (all rows by default)'''
+        i0, i1 = 0, len(self.frame)
+        if start is not None:
+            i0 = max(int(np.searchsorted(self.positions, start)) - 1, 0)
+        if end is not None:
+            i1 = min(int(np.searchsorted(self.positions, end, side='right')) + 1, i1)
+
+        y = self.frame.iloc[i0:i1].to_numpy(np.float64)
+        if self.method == 'lttb':
+            x = self.positions[i0:i1]
+            idx = np.column_stack([lttb_indices(x, y[:, j], self.max_points) for j in range(y.shape[1])])
+        else:
+            idx = minmax_indices(y, self.max_points)
+
+        data = {}
+        for j, c in enumerate(self.frame.columns):
+            name, rows = series_name(c), idx[:, j]
+            data[self.x_column(name)] = self.x[i0 + rows]
+            data[name] = y[rows, j]
+            if self.upper is not None:
+                upper, lower = band_columns(name)
+                data[upper] = self.upper.iloc[:, j].to_numpy()[i0 + rows]
+                data[lower] = self.lower.iloc[:, j].to_numpy()[i0 + rows]
+        return data
+
+    def resample(self, start, end):
+        self.source.data = self.sample(start, end)
+
+    def attach(self, fig):
+        fig.on_event(RangesUpdate, lambda event: self.resample(event.x0, event.x1))
+        return fig
+
 #make an interactive time series plot
+@cached_figure
 def time_series(
     dframe: pd.DataFrame,
     upper_bound: pd.DataFrame = None, #include these to plot confidence intervals
     lower_bound: pd.DataFrame = None, #NOTE: column names must be identical to :arg: dframe
     xlabel: str = None,
     ylabel: str = None,
-    title: str = None
+    title: str = None,
+    rollover: int = None, #keep only the last :arg: rollover rows, see stream_time_series
+    downsample=True, #above POINTS_PER_PIXEL points per pixel of width, see DownsampledSource
+    method='minmax',
+    requery=False #re-sample on zoom, bokeh server documents only, implies cache=False
 ):
 
-    #pre process data
-    COLS = list(dframe.columns)
-
-    ttips = [('Name', '@name'),('Date', '@date_str'), ('Value', '@value{0.00a}')]
-    COLORS = itertools.cycle(bok.palettes.magma(len(COLS)+1))
-
-    fig = default_figure(True, ttips)
-
     #set flag for confidence intervals
-    if isinstance(upper_bound, pd.DataFrame) and isinstance(lower_bound, pd.DataFrame):
-        conf_interval = True 
+    conf_interval = isinstance(upper_bound, pd.DataFrame) and isinstance(lower_bound, pd.DataFrame)
+    if not conf_interval:
+        upper_bound = lower_bound = None
+
+    if rollover is not None:
+        dframe = dframe.iloc[-rollover:]
+
+    fig = default_figure(True)
+    max_points = POINTS_PER_PIXEL * fig.width
+
+    #one wide source for every line and band, dates are formatted in the browser
+    if downsample and len(dframe) > max_points:
+        sampler = DownsampledSource(dframe, upper_bound, lower_bound, max_points, method)
+        if requery:
+            sampler.attach(fig)
+        src, x_column, date_field = sampler.source, sampler.x_column, '$x'
     else:
-        conf_interval = False
-
+        src = bkm.ColumnDataSource(time_series_source_data(dframe, upper_bound, lower_bound))
+        x_column, date_field = (lambda name: DATE_COLUMN), '@{}'.format(DATE_COLUMN)
+    COLORS = itertools.cycle(bok.palettes.magma(len(dframe.columns)+1))
 
-    for c in COLS:
-        df = dframe[c]
+    lines = []
 
-        #in case dframe has multi-index columns
-        if isinstance(c, tuple):
-            name = ':'.join(c)
-        else:
-            name = c
-        df.name = 'value'
-        df.index.name = 'date'
-        df = df.reset_index()
-        df['date_str'] = df['date'].dt.strftime('%Y-%m-%d')
-        df['name'] = name
-
-        src = bkm.ColumnDataSource(df)
+    for c in dframe.columns:
+        name = series_name(c)
         clr = next(COLORS)
-        fig.line(y='value', x='date', source=src, legend_label=name, color=clr, name=name)
+        lines.append(fig.line(y=name, x=x_column(name), source=src, legend_label=name, color=clr, name=name))
 
         if conf_interval:
-            ubound = upper_bound[c]
-            lbound = lower_bound[c]
-            fig.varea(x=ubound.index, y1=ubound.values, y2=lbound.values, fill_color=clr, fill_alpha=0.3, name='{} 95% Confidence Interval'.format(name))
-    
+            upper, lower = band_columns(name)
+            fig.varea(x=x_column(name), y1=upper, y2=lower, source=src, fill_color=clr, fill_alpha=0.3, name='{} 95% Confidence Interval'.format(name))
+
+    #NOTE: @$name looks up the column named after the hovered line
+    fig.add_tools(bkm.HoverTool(
+        renderers=lines,
+        tooltips=[('Name', '$name'), ('Date', '{}{{%F}}'.format(date_field)), ('Value', '@$name{0.00a}')],
+        formatters={date_field: 'datetime'},
+        mode='vline'
+    ))
+
     fig_formatted = bkformat(fig, xlabel, ylabel, title)
 
     return fig_formatted
 
+def stream_time_series(
+    fig,
+    rows: pd.DataFrame,
+    upper_bound: pd.DataFrame = None,
+    lower_bound: pd.DataFrame = None,
+    rollover: int = None
+):
+    '''
+    Append :arg: rows (and their confidence bounds) to a figure made by :func: time_series
+    with ColumnDataSource.stream, keeping at most :arg: rollover points. In a bokeh server
+    document only the new rows are sent to the browser, and with a rollover the history
+    held by the figure stays bounded wherever it is rendered. Series missing from
+    :arg: rows get NaN for the new dates.
+    '''
+    renderer = fig.select_one({'name': series_name(rows.columns[0])}) if len(rows.columns) else None
+    if renderer is None:
+        raise Exception('The figure has no line named after the columns of rows')
+    src = renderer.data_source
+    if DATE_COLUMN not in src.data:
+        raise Exception('Downsampled time series can not be streamed, plot them again or pass downsample=False')
+
+    new = time_series_source_data(rows, upper_bound, lower_bound)
+    missing = np.full(len(rows), np.nan)
+    src.stream({k: new.get(k, missing) for k in src.data}, rollover)
+    return fig
+
+
 
+HIST_CHUNK_ROWS = 2**20
+
+def column_ranges(dframe: pd.DataFrame) -> tuple:
+    '''Minimum and maximum of every column skipping NaN, NaN for empty or all NaN columns'''
+    lows, highs = np.full(dframe.shape[1], np.nan), np.full(dframe.shape[1], np.nan)
+    if len(dframe):
+        for j in range(dframe.shape[1]):
+            col = dframe.iloc[:, j].to_numpy()
+            lows[j], highs[j] = np.fmin.reduce(col), np.fmax.reduce(col)
+    return lows, highs
+
+def bin_edges(dframe: pd.DataFrame, bins, shared=False) -> np.ndarray:
+    '''
+    Edges for :func: histogram_counts. An int :arg: bins gives that many evenly spaced
+    edges (so bins - 1 bars, as bquad always drew) from the minimum to the maximum of each
+    column, or of all columns when :arg: shared, other values are used as the edges.
+    Returns (nedges,) edges shared by every column or (ncols, nedges) per column edges.
+    '''
+    if not np.isscalar(bins):
+        return np.asarray(bins, dtype=np.float64)
+    lows, highs = column_ranges(dframe)
+    if shared:
+        return np.linspace(np.nanmin(lows), np.nanmax(highs), bins)
+    return np.linspace(lows, highs, bins, axis=1)
+
+def histogram_counts(dframe: pd.DataFrame, edges: np.ndarray) -> np.ndarray:
+    '''
+    (ncols, nedges - 1) counts of every column of :arg: dframe. Bins are closed on the
+    left, the last one on both sides, as with np.histogram. NaN and values outside the
+    edges are not counted.
+
+    Each column is read in place (no copy of the frame) a chunk at a time. For evenly
+    spaced edges values are mapped to bins arithmetically, NaN and out of range values to
+    an overflow bin, and counted with one np.bincount per chunk, with no sorting or
+    boolean indexing. Other edges go through np.searchsorted.
+    '''
+    ncols = dframe.shape[1]
+    edges = np.atleast_2d(np.asarray(edges, dtype=np.float64))
+    nbins = edges.shape[1] - 1
+    widths = np.diff(edges, axis=1)
+    uniform = np.allclose(widths, widths[:, :1], equal_nan=True)
+
+    counts = np.zeros((ncols, nbins + 2), dtype=np.int64)
+    for j in range(ncols):
+        col = dframe.iloc[:, j].to_numpy()
+        if col.dtype.kind != 'f':
+            col = col.astype(np.float64)
+        col_edges = edges[j % len(edges)]
+        low, high = col_edges[0], col_edges[-1]
+        scale = nbins / (high - low) if high > low else 0.0
+
+        for start in range(0, len(col), HIST_CHUNK_ROWS):
+            x = col[start:start + HIST_CHUNK_ROWS]
+            if uniform:
+                y = np.subtract(x, low, dtype=np.float64)
+                y *= scale
+                #NaN and values below the edges fail y >= 0, values above them land past nbins
+                np.putmask(y, ~(y >= 0) | (y > nbins), nbins + 1)
+                idx = y.astype(np.intp)
+            else:
+                idx = np.searchsorted(col_edges, x, side='right') - 1
+                idx[x == high] = nbins - 1
+                idx[(idx < 0) | (idx >= nbins)] = nbins + 1 #includes NaN, sorted past the last edge
+            counts[j] += np.bincount(idx, minlength=nbins + 2)
+
+    #index nbins holds values equal to the last edge, which belong to the last bin
+    counts[:, nbins - 1] += counts[:, nbins]
+    return counts[:, :nbins]
 
 #helper function that returns bar dimensions
 #to plot returns distribution
 def bquad(srs, bins):
-    bounds_dict = {}
-    try:
-        rbins = pd.cut(srs, np.linspace(srs.min(), srs.max(), bins))
-    except ValueError:
+    edges = bin_edges(srs.to_frame(), bins)
+    if not np.all(np.diff(edges) > 0):
         raise Exception('Error generating bins. Try decrease the bin count or setting a longer timeframe')
-    rgrp = rbins.groupby(rbins).count()
-    bounds_dict['top'] = [x for x in rgrp]
-    bounds_dict['left'] = [x.left for x in rgrp.index]
-    bounds_dict['right'] = [x.right for x in rgrp.index]
-    bounds_dict['bottom'] = [0]*len(rgrp)
-    return bounds_dict
-
-def hist(dframe: pd.DataFrame, bins: int):
+    counts = histogram_counts(srs.to_frame(), edges)[0]
+    edges = edges[0] if edges.ndim == 2 else edges
+    return {
+        'top': counts.tolist(),
+        'left': edges[:-1].tolist(),
+        'right': edges[1:].tolist(),
+        'bottom': [0]*len(counts),
+    }
 
+@cached_figure
+def hist(dframe: pd.DataFrame, bins: int, shared_bins=False):
+    '''
+    One set of bars per column, all drawn from a single source of left, right, top,
+    bottom and name columns, with a view selecting each column's bars.
+    '''
     ncols = len(dframe.columns)
     COLORS = itertools.cycle(bok.palettes.magma(ncols+1))
     ttips = [('Name', '$name'), ('Count', '@top'), ('Value', '$x{0,0.00}')]
 
+    edges = bin_edges(dframe, bins, shared_bins)
+    counts = histogram_counts(dframe, edges)
+    nbins = counts.shape[1]
+    edges = np.broadcast_to(np.atleast_2d(edges), (ncols, nbins + 1))
+
+    src = bkm.ColumnDataSource({
+        'left': edges[:, :-1].ravel(),
+        'right': edges[:, 1:].ravel(),
+        'top': counts.ravel(),
+        'bottom': np.zeros(counts.size, dtype=np.int64),
+        'name': np.repeat(np.array([str(k) for k in dframe.columns], dtype=object), nbins),
+    })
 
     myfig = default_figure(ttips=ttips)
-    for k in dframe.columns:
-        kw = bquad(dframe[k], bins)
+    for j, k in enumerate(dframe.columns):
+        view = bkm.CDSView(filter=bkm.IndexFilter(list(range(j * nbins, (j + 1) * nbins))))
         myfig.quad(
-            top=kw['top'],
-            bottom=kw['bottom'],
-            left=kw['left'],
-            right=kw['right'],
-            legend_label=k, 
+            top='top',
+            bottom='bottom',
+            left='left',
+            right='right',
+            source=src,
+            view=view,
+            legend_label=str(k),
             color=next(COLORS),
-            name=k
+            name=str(k)
             )
     return myfig
 
 
+QQ_POINTS = 2000 #most points drawn per series
+QQ_TAIL = 100 #smallest and largest values always drawn
+QQ_CACHE_BYTES = 128 * 2**20
+
+#NOTE: process wide, theoretical quantiles per (sample size, distribution) and thinned points per sample
+QUANTILE_CACHE = LRUCache(max_bytes=QQ_CACHE_BYTES)
+QQ_CACHE = LRUCache(max_bytes=QQ_CACHE_BYTES)
+
+def order_statistic_medians(n) -> np.ndarray:
+    #Filliben's estimate, as scipy's probplot
+    v = np.empty(n, dtype=np.float64)
+    v[-1] = 0.5**(1.0 / n)
+    v[0] = 1 - v[-1]
+    v[1:-1] = (np.arange(2, n) - 0.3175) / (n + 0.365)
+    return v
+
+def theoretical_quantiles(n, dist='norm', sparams=()) -> np.ndarray:
+    '''
+    Quantiles of :arg: dist at the order statistic medians of a sample of size :arg: n,
+    the x values of scipy's probplot, computed once per size and distribution
+    '''
+    dist_obj = getattr(ss, dist) if isinstance(dist, str) else dist
+    name = dist if isinstance(dist, str) else getattr(dist, 'name', None) if hasattr(dist, 'numargs') else None
+    if name is None: #frozen or custom distributions are not cached
+        return dist_obj.ppf(order_statistic_medians(n), *sparams)
+
+    key = (n, name, tuple(sparams))
+    quantiles = QUANTILE_CACHE.get(key)
+    if quantiles is None:
+        quantiles = dist_obj.ppf(order_statistic_medians(n), *sparams)
+        quantiles.flags.writeable = False
+        QUANTILE_CACHE.put(key, quantiles)
+    return quantiles
+
+def qq_ranks(n, max_points=QQ_POINTS, tail=QQ_TAIL) -> np.ndarray:
+    '''
+    Ranks drawn for a sample of size :arg: n: all of them up to :arg: max_points, otherwise
+    the :arg: tail smallest and largest exactly and evenly spaced ranks (a grid of
+    quantiles) in between
+    '''
+    if n <= max_points:
+        return np.arange(n)
+    body = np.linspace(tail, n - tail - 1, max_points - 2 * tail).round().astype(np.int64)
+    return np.unique(np.concatenate([np.arange(tail), body, np.arange(n - tail, n)]))
+
+def qq_points(dframe: pd.DataFrame, dist='norm', sparams=(), max_points=QQ_POINTS, tail=QQ_TAIL) -> tuple:
+    '''
+    Probability plot points of every column of :arg: dframe, thinned by :func: qq_ranks.
+    All columns are sorted in one call (NaN are dropped), and the least squares line of
+    scipy's probplot is fit on every point, not just the drawn ones.
+
+    Returns a long frame of name, osm (theoretical) and osr (ordered) values and a frame of
+    slope, intercept and r per series. Results are cached on a sampled fingerprint of the data.
+    '''
+    sparams = tuple(np.atleast_1d(sparams)) if sparams is not None else ()
+    key = fingerprint('qq_points', dframe, str(dist), sparams, max_points, tail, sample_rows=FINGERPRINT_SAMPLE_ROWS)
+    cached = QQ_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    values = np.sort(dframe.to_numpy(np.float64), axis=0) #NaN sort last
+    counts = dframe.notna().sum().to_numpy()
+    points, fits = [], {}
+    for j, c in enumerate(dframe.columns):
+        name, n = series_name(c), counts[j]
+        if n < 2:
+            continue
+        osr = values[:n, j]
+        osm = theoretical_quantiles(n, dist, sparams)
+        fit = ss.linregress(osm, osr)
+        fits[name] = {'slope': fit.slope, 'intercept': fit.intercept, 'r': fit.rvalue}
+
+        ranks = qq_ranks(n, max_points, tail)
+        points.append(pd.DataFrame({'name': name, 'osm': osm[ranks], 'osr': osr[ranks]}))
+
+    result = (
+        pd.concat(points, ignore_index=True) if points else pd.DataFrame(columns=['name', 'osm', 'osr']),
+        pd.DataFrame.from_dict(fits, orient='index', columns=['slope', 'intercept', 'r'])
+    )
+    QQ_CACHE.put(key, result)
+    return result
+
+#NOTE: scipy.stats.probplot arguments prob_plot used to forward, the fitted line is always drawn
+PROBPLOT_IGNORED = ('fit', 'plot', 'rvalue')
+
 def prob_plot(rets, fig=None, **kwargs):
-    data, params = ss.probplot(rets, **kwargs)
-    fitted = (params[0]*data[0]+params[1])
+    '''
+    Probability plot of :arg: rets, see :func: prob_plots. dist and sparams are passed on,
+    the other scipy.stats.probplot arguments (fit, plot, rvalue) are accepted and ignored.
+    '''
+    for key in PROBPLOT_IGNORED:
+        kwargs.pop(key, None)
+    if isinstance(rets, pd.Series):
+        frame = rets.to_frame(rets.name if rets.name is not None else 'Returns')
+    else:
+        frame = pd.DataFrame({'Returns': np.asarray(rets)})
+    return prob_plots(frame, fig, **kwargs)
+
+@cached_figure
+def prob_plots(dframe: pd.DataFrame, fig=None, dist='norm', sparams=(), max_points=QQ_POINTS, tail=QQ_TAIL):
+    '''
+    Probability plots of every column of :arg: dframe on one figure, drawn from one source
+    of thinned points (see :func: qq_points) with a view per series, each with its fitted line
+    '''
+    points, fits = qq_points(dframe, dist, sparams, max_points, tail)
 
     if not fig:
         fig = default_figure()
 
-    if isinstance(rets, pd.Series):
-        name = rets.name 
-    else:
-        name = 'Returns'
-    
-    fitted_name = ' '.join(['Fitted', name])
-    clr = next(colors)
-    fig.scatter(x=data[0], y=data[1], legend_label=name, line_color=clr, name=name)
-    fig.line(x=data[0], y=fitted, legend_label=fitted_name, line_color=clr, name=fitted_name)
+    src = bkm.ColumnDataSource(points)
+    for name, rows in points.groupby('name', sort=False).indices.items():
+        fitted_name = ' '.join(['Fitted', name])
+        clr = next(colors)
+        view = bkm.CDSView(filter=bkm.IndexFilter(rows.tolist()))
+        fig.scatter(x='osm', y='osr', source=src, view=view, legend_label=name, line_color=clr, name=name)
+
+        ends = points['osm'].to_numpy()[rows[[0, -1]]]
+        slope, intercept = fits.loc[name, 'slope'], fits.loc[name, 'intercept']
+        fig.line(x=ends, y=slope*ends + intercept, legend_label=fitted_name, line_color=clr, name=fitted_name)
     return fig 
 
+def default_nlags(nobs) -> int:
+    #same default as statsmodels' acf
+    return min(int(10 * np.log10(nobs)), nobs - 1)
+
+def batch_acf(dframe: pd.DataFrame, nlags=None, adjusted=False, alpha=0.05) -> tuple:
+    '''
+    Autocorrelations of every column of :arg: dframe up to :arg: nlags from one FFT over
+    all columns, with Bartlett confidence intervals, as statsmodels' acf computes them with
+    missing='conservative': NaN are left out of the means and the lagged products, and
+    with :arg: adjusted every lag is divided by its number of non missing pairs.
+    Returns (acf, lower, upper) frames indexed by lag with a column per series.
+    '''
+    x = dframe.to_numpy(np.float64)
+    n = len(x)
+    nlags = default_nlags(n) if nlags is None else nlags
+    mask = ~np.isnan(x)
+    nobs = mask.sum(axis=0)
+    means = np.divide(np.where(mask, x, 0.0).sum(axis=0), nobs, out=np.zeros(x.shape[1]), where=nobs > 0)
+    xo = np.where(mask, x - means, 0.0)
+
+    size = next_fast_len(2 * n - 1, real=True)
+    spectrum = rfft(xo, size, axis=0)
+    acov = irfft(spectrum.real**2 + spectrum.imag**2, size, axis=0)[:nlags + 1]
+    if adjusted:
+        if mask.all():
+            pairs = (n - np.arange(nlags + 1))[:, None]
+        else:
+            mask_spectrum = rfft(mask.astype(np.float64), size, axis=0)
+            pairs = np.rint(irfft(mask_spectrum.real**2 + mask_spectrum.imag**2, size, axis=0)[:nlags + 1])
+            pairs[pairs == 0] = 1
+        acov = acov / pairs
+
+    with np.errstate(invalid='ignore', divide='ignore'): #constant or empty columns
+        acf = acov / acov[0]
+        varacf = np.ones_like(acf) / nobs
+    varacf[0] = 0
+    varacf[2:] *= 1 + 2 * np.cumsum(acf[1:-1] ** 2, axis=0)
+    interval = ss.norm.ppf(1 - alpha / 2.0) * np.sqrt(varacf)
+
+    columns = [series_name(c) for c in dframe.columns]
+    frame = lambda values: pd.DataFrame(values, index=pd.RangeIndex(nlags + 1, name='lag'), columns=columns)
+    return frame(acf), frame(acf - interval), frame(acf + interval)
+
+def batch_pacf(dframe: pd.DataFrame, nlags=None, adjusted=False, alpha=0.05) -> tuple:
+    '''
+    Partial autocorrelations of every column from :func: batch_acf by the Levinson-Durbin
+    recursion, run on all columns at once (statsmodels' pacf methods 'ldb', or 'lda' with
+    :arg: adjusted), with confidence intervals of +/- z / sqrt(nobs).
+    Returns (pacf, lower, upper) like batch_acf.
+    '''
+    nlags = default_nlags(len(dframe)) if nlags is None else nlags
+    acf, _, _ = batch_acf(dframe, nlags, adjusted, alpha)
+    r = acf.to_numpy()
+
+    pacf = np.ones_like(r)
+    phi = np.zeros((nlags, r.shape[1])) #coefficients of the order m - 1 autoregression
+    for m in range(1, nlags + 1):
+        prev = phi[:m - 1]
+        num = r[m] - (prev * r[m - 1:0:-1]).sum(axis=0)
+        den = 1 - (prev * r[1:m]).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pacf[m] = num / den
+        phi[:m - 1] = prev - pacf[m] * prev[::-1]
+        phi[m - 1] = pacf[m]
+
+    nobs = dframe.notna().sum().to_numpy()
+    with np.errstate(divide='ignore'):
+        interval = np.broadcast_to(ss.norm.ppf(1 - alpha / 2.0) / np.sqrt(nobs), r.shape).copy()
+    interval[0] = 0
+    frame = lambda values: pd.DataFrame(values, index=acf.index, columns=acf.columns)
+    return frame(pacf), frame(pacf - interval), frame(pacf + interval)
+
+def acf_source(dframe: pd.DataFrame, pacf=False, **acf_kwargs) -> bkm.ColumnDataSource:
+    '''One source with the lags and, per series, its autocorrelations and their band'''
+    values, lower, upper = (batch_pacf if pacf else batch_acf)(dframe, **acf_kwargs)
+    data = {'lag': values.index.to_numpy()}
+    for name in values.columns:
+        band_lower, band_upper = band_columns(name)[::-1]
+        data[name] = values[name].to_numpy()
+        data[band_lower] = lower[name].to_numpy()
+        data[band_upper] = upper[name].to_numpy()
+    return bkm.ColumnDataSource(data)
+
+@cached_figure
 def acf_plot(rets, fig=None, adjusted=False, alpha=0.05, nlags=None):
         
-    data, conf = acf(rets, adjusted=adjusted, alpha=alpha, nlags=nlags)
+    frame = rets.to_frame() if isinstance(rets, pd.Series) else pd.DataFrame({0: np.asarray(rets)})
+    data, lower, upper = batch_acf(frame, nlags, adjusted, alpha)
+    data, lower, upper = data.iloc[:, 0], lower.iloc[:, 0], upper.iloc[:, 0]
     xrange = [x for x in range(len(data))]
     if not fig:
         fig = default_figure()
@@ -172,7 +712,54 @@ def acf_plot(rets, fig=None, adjusted=False, alpha=0.05, nlags=None):
     conf_name = ' '.join([name, '{}%'.format(int((1-alpha)*100)),'Confidence Interval'])
 
     clr = next(colors)
-    fig.line(x=xrange, y=data, legend_label=name, line_color=clr)
-    fig.varea(x=xrange, y1=conf[:, 0], y2=conf[:, 1], alpha=0.2, legend_label=conf_name, color=clr)
+    fig.line(x=xrange, y=data.to_numpy(), legend_label=name, line_color=clr)
+    fig.varea(x=xrange, y1=lower.to_numpy(), y2=upper.to_numpy(), alpha=0.2, legend_label=conf_name, color=clr)
     return fig 
 
+@cached_figure
+def acf_grid(dframe: pd.DataFrame, ncols=4, pacf=False, width=250, height=200, **acf_kwargs):
+    '''
+    Small multiples of the ACF (or PACF) of every column, in a grid of :arg: ncols
+    figures per row drawing from one shared source, with linked axes.
+    '''
+    src = acf_source(dframe, pacf, **acf_kwargs)
+    names = [series_name(c) for c in dframe.columns]
+    figs = []
+    for name in names:
+        upper, lower = band_columns(name)
+        linked = {'x_range': figs[0].x_range, 'y_range': figs[0].y_range} if figs else {}
+        fig = bkp.figure(width=width, height=height, title=name, **linked)
+        clr = next(colors)
+        fig.varea(x='lag', y1=lower, y2=upper, source=src, alpha=0.2, color=clr)
+        fig.line(x='lag', y=name, source=src, line_color=clr)
+        figs.append(fig)
+    return gridplot(figs, ncols=ncols, toolbar_location=TOOLBAR_LOC)
+
+@cached_figure
+def acf_select(dframe: pd.DataFrame, pacf=False, **acf_kwargs):
+    '''
+    One ACF (or PACF) figure with a select box choosing the series, switched in the
+    browser between columns of one shared source.
+    '''
+    src = acf_source(dframe, pacf, **acf_kwargs)
+    names = [series_name(c) for c in dframe.columns]
+    upper, lower = band_columns(names[0])
+    clr = next(colors)
+
+    fig = default_figure()
+    band = fig.varea(x='lag', y1=lower, y2=upper, source=src, alpha=0.2, color=clr)
+    line = fig.line(x='lag', y=names[0], source=src, line_color=clr)
+    fig.title.text = names[0]
+
+    select = bkm.Select(title='Series', value=names[0], options=names)
+    select.js_on_change('value', bkm.CustomJS(
+        args={'line': line.glyph, 'band': band.glyph, 'title': fig.title},
+        code='''
+            const name = cb_obj.value
+            line.y = {field: name}
+            band.y1 = {field: name + ' lower'}
+            band.y2 = {field: name + ' upper'}
+            title.text = name
+        '''
+    ))
+    return column(select, fig, sizing_mode=SIZING_MODE)
@@ -0,0 +1,228 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+PoolKey = Tuple[str, str, str]
+
+#NOTE: random per process, digests only ever compare passwords given to this process
+_DIGEST_KEY = os.urandom(32)
+
+def credential_digest(pwd) -> str:
+    '''Keyed hash of a password, kept with pooled connections instead of the password itself'''
+    return hashlib.blake2b(str(pwd).encode(), key=_DIGEST_KEY, digest_size=32).hexdigest()
+
+def same_credentials(a: str, b: str) -> bool:
+    return hmac.compare_digest(a, b)
+
+
+class PooledConnection:
+
+    '''
+    Wraps a DB-API connection checked out of a :class: ConnectionPool.
+    Calling close (or leaving a with block) hands the connection back to the pool
+    instead of closing it. Every other attribute is forwarded to the connection.
+    '''
+
+    def __init__(self, pool, key: PoolKey, conn, digest: str) -> None:
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._digest = digest
+
+    @property
+    def key(self) -> PoolKey:
+        '''(uid, server, database) the connection was opened for'''
+        return self._key
+
+    @property
+    def digest(self) -> str:
+        '''credential_digest of the password the connection was opened with'''
+        return self._digest
+
+    @property
+    def raw(self):
+        if self._conn is None:
+            raise Exception('Connection was already returned to the pool')
+        return self._conn
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(self._key, conn, self._digest)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+class ConnectionPool:
+
+    '''
+    Thread safe pool of connections keyed by (uid, server, database).
+
+    :arg: connect_factory is called as connect_factory(uid, pwd, server, database)
+    and must return a DB-API connection, e.g. pyodbc.connect or sqlite3.connect.
+    At most :arg: max_size connections are open per key; acquire waits up to
+    :arg: timeout seconds for one to be released. Idle connections older than
+    :arg: max_idle seconds are closed, and idle connections are checked with
+    :arg: health_query before being handed out.
+
+    An idle connection is only handed to a caller giving the same password it was
+    opened with (compared by :func: credential_digest), any other caller gets a new
+    connection so the server checks the login.
+    '''
+
+    def __init__(
+        self,
+        connect_factory: Callable[[str, str, str, str], Any],
+        max_size=5,
+        max_idle=300,
+        timeout=30,
+        health_query='SELECT 1'
+    ) -> None:
+        self.connect_factory = connect_factory
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.health_query = health_query
+        self._idle: Dict[PoolKey, List[Tuple[Any, float, str]]] = {}
+        self._open: Dict[PoolKey, int] = {}
+        self._cond = threading.Condition()
+
+    def size(self, uid, server, database) -> int:
+        '''Number of open connections (idle and checked out) for a key'''
+        with self._cond:
+            return self._open.get((uid, server, database), 0)
+
+    def idle(self, uid, server, database) -> int:
+        with self._cond:
+            return len(self._idle.get((uid, server, database), []))
+
+    def acquire(self, uid, pwd, server, database) -> PooledConnection:
+        key = (uid, server, database)
+        digest = credential_digest(pwd)
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            conn = self._checkout(key, digest, deadline)
+
+            if conn is None:
+                try:
+                    conn = self.connect_factory(uid, pwd, server, database)
+                except Exception:
+                    self._forget(key)
+                    raise
+                return PooledConnection(self, key, conn, digest)
+
+            if self._healthy(conn):
+                return PooledConnection(self, key, conn, digest)
+            self._discard(key, conn)
+
+    def release(self, key: PoolKey, conn, digest: str):
+        '''Roll back any open transaction and return :arg: conn to the idle list'''
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(key, conn)
+            return
+
+        with self._cond:
+            self._idle.setdefault(key, []).append((conn, time.monotonic(), digest))
+            self._cond.notify()
+
+    def evict_idle(self) -> int:
+        '''Close connections idle for longer than max_idle, returns the number closed'''
+        cutoff = time.monotonic() - self.max_idle
+        expired = []
+        with self._cond:
+            for key, idle in self._idle.items():
+                keep = [entry for entry in idle if entry[1] >= cutoff]
+                expired.extend((key, c) for c, t, _ in idle if t < cutoff)
+                idle[:] = keep
+            for key, _ in expired:
+                self._open[key] -= 1
+            if expired:
+                self._cond.notify_all()
+
+        for _, conn in expired:
+            self._close(conn)
+        return len(expired)
+
+    def close_all(self):
+        '''Close every idle connection, checked out connections are closed on release'''
+        with self._cond:
+            idle = [(key, c) for key, conns in self._idle.items() for c, _, _ in conns]
+            self._idle.clear()
+            for key, _ in idle:
+                self._open[key] -= 1
+            self._cond.notify_all()
+
+        for _, conn in idle:
+            self._close(conn)
+
+    def _checkout(self, key: PoolKey, digest: str, deadline: float):
+        '''
+        Pop the most recently used idle connection opened with the same password, or
+        reserve a slot and return None. When the key is at max_size, the oldest idle
+        connection opened with another password is closed to make room.
+        '''
+        self.evict_idle()
+        with self._cond:
+            while True:
+                idle = self._idle.get(key, [])
+                for i in range(len(idle) - 1, -1, -1):
+                    if same_credentials(idle[i][2], digest):
+                        return idle.pop(i)[0]
+
+                if self._open.get(key, 0) < self.max_size:
+                    self._open[key] = self._open.get(key, 0) + 1
+                    return None
+
+                if idle:
+                    stale, _, _ = idle.pop(0)
+                    self._close(stale) #the slot passes to this caller, _open is unchanged
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception('Timed out waiting for a connection to {} ({} open)'.format(key[1:], self.max_size))
+                self._cond.wait(remaining)
+
+    def _healthy(self, conn) -> bool:
+        if self.health_query is None:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _forget(self, key: PoolKey):
+        with self._cond:
+            self._open[key] -= 1
+            self._cond.notify()
+
+    def _discard(self, key: PoolKey, conn):
+        self._forget(key)
+        self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,299 @@
+import os
+import sys
+import hashlib
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .cache import LRUCache, estimate_size, shared_copy
+
+SPILL_BYTES = 32 * 2**20
+HOT_BYTES = 256 * 2**20
+RESIDENT_BYTES = 256 * 2**20 #in memory frames per store before the least recently used are spilled
+
+#NOTE: process wide so the hot set is bounded no matter how many sessions or stores exist
+HOT_FRAMES = LRUCache(max_bytes=HOT_BYTES)
+
+_spill_dir = None
+
+def spill_directory() -> str:
+    '''Process wide temporary directory for spilled datasets, created on first use'''
+    global _spill_dir
+    if _spill_dir is None:
+        _spill_dir = tempfile.mkdtemp(prefix='stream-datasets-')
+    return _spill_dir
+
+def _remove_file(path):
+    HOT_FRAMES.pop(path)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def cell_types(values) -> np.ndarray:
+    '''The type of every cell of an object array, as ids: digests are only compared within the process'''
+    values = np.asarray(values, dtype=object)
+    return np.fromiter(map(id, map(type, values)), dtype=np.int64, count=len(values))
+
+def frame_digest(df: pd.DataFrame) -> Optional[str]:
+    '''
+    Hash of a frame's values, index, column labels and dtypes, None if a cell is unhashable.
+    hash_pandas_object hashes object cells by their str, so the type of every cell of
+    object columns is hashed too ('1' and 1 are different data).
+    '''
+    try:
+        rows = pd.util.hash_pandas_object(df, index=True).values
+    except TypeError:
+        return None
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(repr((df.index.names, str(df.index.dtype))).encode())
+    h.update(rows.tobytes())
+    if df.index.dtype == object:
+        h.update(cell_types(df.index).tobytes())
+    for i, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            h.update(repr(i).encode())
+            h.update(cell_types(df.iloc[:, i]).tobytes())
+    return h.hexdigest()
+
+
+class SharedFrame:
+
+    '''
+    Immutable handle to an in memory DataFrame that can be held by many sessions.
+    Copying a handle returns the same handle and load() hands out copy on write views
+    (see cache.shared_copy: on pandas 2.x only when the copy_on_write option is on,
+    deep copies otherwise).
+    '''
+
+    def __init__(self, df: pd.DataFrame, digest: Optional[str] = None) -> None:
+        self.digest = digest
+        self.nbytes = estimate_size(df)
+        self.shape = df.shape
+        self._df = shared_copy(df)
+
+    def load(self) -> pd.DataFrame:
+        return shared_copy(self._df)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return '{}(shape={}, nbytes={})'.format(self.__class__.__name__, self.shape, self.nbytes)
+
+
+class SpilledFrame(SharedFrame):
+
+    '''
+    Handle to a DataFrame written to an Arrow IPC file.
+
+    Handles are immutable, so copying one (including the deep copies made by
+    Session) returns the same handle. The file is deleted once the last handle
+    referring to it is garbage collected.
+    '''
+
+    def __init__(self, df: pd.DataFrame, directory: Optional[str] = None, digest: Optional[str] = None) -> None:
+        directory = directory or spill_directory()
+        self.digest = digest
+        self.path = os.path.join(directory, '{}.arrow'.format(uuid.uuid4().hex))
+        self.nbytes = estimate_size(df)
+        self.shape = df.shape
+
+        table = pa.Table.from_pandas(df)
+        try:
+            with pa.OSFile(self.path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        except Exception:
+            _remove_file(self.path)
+            raise
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+    def load(self) -> pd.DataFrame:
+        '''
+        Memory mapped view of the frame. Numeric columns without nulls are not copied,
+        they are backed by the page cache. Every load is a copy on write view of the frame
+        kept in HOT_FRAMES, so changes made by one reader are not seen by the others.
+        '''
+        df = HOT_FRAMES.get(self.path)
+        if df is None:
+            table = pa.ipc.open_file(pa.memory_map(self.path, 'r')).read_all()
+            df = table.to_pandas(split_blocks=True, self_destruct=False)
+            HOT_FRAMES.put(self.path, df)
+        return shared_copy(df)
+
+
+def spill_frame(df: pd.DataFrame, directory=None, digest=None) -> Optional[SpilledFrame]:
+    '''SpilledFrame of :arg: df, None if Arrow can not store it (e.g. object columns mixing numbers and text)'''
+    try:
+        return SpilledFrame(df, directory, digest)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+
+
+class FrameRegistry:
+
+    '''
+    Process wide, content addressed index of frame handles.
+
+    intern() returns the existing handle when a frame with the same content was
+    already interned by any session, so identical datasets are held once per process.
+    The registry only keeps weak references: a handle, and its spill file, lives as
+    long as some session's page data still refers to it.
+    '''
+
+    def __init__(self) -> None:
+        self._handles = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def intern(self, df: pd.DataFrame, spill_bytes=SPILL_BYTES, directory=None) -> Optional[SharedFrame]:
+        '''Shared handle for :arg: df, or None if it can not be hashed'''
+        digest = frame_digest(df)
+        if digest is None:
+            return None
+
+        with self._lock:
+            handle = self._handles.get(digest)
+            if handle is None:
+                if estimate_size(df) >= spill_bytes:
+                    handle = spill_frame(df, directory, digest)
+                if handle is None:
+                    handle = SharedFrame(df, digest)
+                self._handles[digest] = handle
+            return handle
+
+    def refcount(self, digest) -> int:
+        '''Number of references to a handle held outside the registry'''
+        handle = self._handles.get(digest)
+        #NOTE: minus the getrefcount argument and the local variable
+        return 0 if handle is None else sys.getrefcount(handle) - 2
+
+    @property
+    def nbytes(self) -> int:
+        return sum(h.nbytes for h in list(self._handles.values()))
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    def __contains__(self, digest) -> bool:
+        return digest in self._handles
+
+    #NOTE: stores refer to the process wide registry, copies of a store must too
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+SHARED_FRAMES = FrameRegistry()
+
+
+class DatasetStore(MutableMapping):
+
+    '''
+    Drop in replacement for the :dict: behind Pandas.datasets.
+
+    Frames smaller than :arg: spill_bytes are kept in memory as usual. Larger ones
+    are written to Arrow IPC files under :arg: directory and handed back as memory
+    mapped views (see :meth: SpilledFrame.load), with recently used views kept in the
+    process wide HOT_FRAMES cache. Once the frames kept in memory add up to more than
+    :arg: max_resident_bytes, the least recently used ones are spilled too. Only the
+    in memory frames are copied with the session tree. Frames Arrow can not store
+    (object columns mixing types) stay in memory.
+
+    With :arg: dedupe every frame is interned in :arg: registry instead, and the
+    store only keeps handles: sessions loading the same data share one copy of it.
+    '''
+
+    def __init__(self, spill_bytes=SPILL_BYTES, directory=None, dedupe=False, registry=None, max_resident_bytes=RESIDENT_BYTES) -> None:
+        self.spill_bytes = spill_bytes
+        self.directory = directory
+        self.dedupe = dedupe
+        self.registry = registry if registry is not None else SHARED_FRAMES
+        self.max_resident_bytes = max_resident_bytes
+        self._data: Dict[str, Union[pd.DataFrame, SharedFrame]] = OrderedDict() #least recently used first
+        self._sizes: Dict[str, int] = {} #bytes of the frames kept in memory
+        self._unspillable = set()
+
+    def __getitem__(self, name) -> pd.DataFrame:
+        value = self._data[name]
+        self._data.move_to_end(name)
+        if isinstance(value, SharedFrame):
+            return value.load()
+        return value
+
+    def __setitem__(self, name, df):
+        self._forget(name)
+        if isinstance(df, pd.DataFrame):
+            handle = self.registry.intern(df, self.spill_bytes, self.directory) if self.dedupe else None
+            size = estimate_size(df) if handle is None else 0
+            if handle is None and size >= self.spill_bytes:
+                handle = spill_frame(df, self.directory)
+                if handle is None:
+                    self._unspillable.add(name)
+            if handle is not None:
+                df = handle
+            else:
+                self._sizes[name] = size
+        self._data[name] = df
+        self._data.move_to_end(name)
+        self._spill_over_budget()
+
+    def __delitem__(self, name):
+        del self._data[name]
+        self._forget(name)
+
+    def _forget(self, name):
+        self._sizes.pop(name, None)
+        self._unspillable.discard(name)
+
+    def _spill_over_budget(self):
+        '''Spill the least recently used in memory frames until they fit in max_resident_bytes'''
+        if self.max_resident_bytes is None:
+            return
+        total = sum(self._sizes.values())
+        for name in list(self._data):
+            if total <= self.max_resident_bytes:
+                break
+            if name not in self._sizes or name in self._unspillable:
+                continue
+            handle = spill_frame(self._data[name], self.directory)
+            if handle is None:
+                self._unspillable.add(name)
+                continue
+            self._data[name] = handle
+            total -= self._sizes.pop(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def is_spilled(self, name) -> bool:
+        return isinstance(self._data[name], SpilledFrame)
+
+    def handle(self, name) -> Optional[SharedFrame]:
+        value = self._data[name]
+        return value if isinstance(value, SharedFrame) else None
+
+    @property
+    def resident_bytes(self) -> int:
+        '''Bytes held in memory by this store only, not counting shared handles or the hot cache'''
+        return sum(self._sizes.values())
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(self.__class__.__name__, list(self._data))
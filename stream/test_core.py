@@ -1,4 +1,6 @@
-from core import Session, Page, Element, DefaultStartPage
+from stream.core import Session, Page, Element
+from stream.jobs import CANCELLED, DONE, FAILED, RUNNING
+import threading
 import streamlit as st
 import numpy as np
 from treelib import Tree
@@ -128,8 +130,94 @@ class TestPage(TestCase):
         
 
 
-    
-        
+class TestSnapshot(TestCase):
+
+    name = 'TestSnapshot'
+
+    def rerun(self):
+        session = Session(self.name, start_page=Page('Home', 'home'), copy_on_write=True)
+        session.setup()
+        return session
+
+    def test_unchanged_page_reused(self):
+        session = self.rerun()
+        session.add_node(Page('Prices', 'prices', data={'prices': np.arange(5)}))
+        session.update('prices')
+        persisted = st.session_state[self.name]['locals'].get_node('prices')
+
+        session = self.rerun()
+        session.update('prices')
+        snapshot = st.session_state[self.name]['locals']
+        assertTrue('Unchanged page keeps its persisted node', snapshot.get_node('prices') is persisted)
+        assertTrue('Session works on a copy of the page', session.get_node('prices') is not persisted)
+
+    def test_changed_page_copied(self):
+        session = self.rerun()
+        session.add_node(Page('Prices', 'prices', data={'prices': np.arange(5)}))
+        session.update('prices')
+        persisted = st.session_state[self.name]['locals'].get_node('prices')
+        unchanged = st.session_state[self.name]['locals'].get_node('home')
+
+        session = self.rerun()
+        session.get_node('prices').data['prices'] = np.arange(10)
+        session.update('prices')
+        snapshot = st.session_state[self.name]['locals']
+        assertTrue('Changed page is copied', snapshot.get_node('prices') is not persisted)
+        assertEqual('Copy holds the new value', 10, len(snapshot.get_node('prices').data['prices']))
+        assertEqual('Persisted node keeps the old value', 5, len(persisted.data['prices']))
+        assertTrue('Other pages keep their persisted node', snapshot.get_node('home') is unchanged)
+
+
+class TestJobs(TestCase):
+
+    name = 'TestJobs'
+
+    def session(self):
+        session = Session(self.name, start_page=Page('Home', 'home'))
+        session.setup()
+        session.active_page.setup()
+        return session
+
+    def test_dedupe(self):
+        session = self.session()
+        release = threading.Event()
+        job = session.submit('wait', release.wait, 5)
+        again = session.submit('wait', release.wait, 5)
+        assertTrue('Job of the same name is returned', again is job)
+        release.set()
+        job.result(5)
+        assertEqual('Finished job polled as done', {'wait': DONE}, session.poll())
+        assertTrue('Done job is returned', session.submit('wait', release.wait, 5) is job)
+
+    def test_failed_job_kept(self):
+        session = self.session()
+        job = session.submit('fail', int, 'not a number')
+        job.exception(5)
+        assertEqual('Failed job polled as failed', FAILED, session.poll()['fail'])
+        assertTrue('Failed job is not submitted again', session.submit('fail', int, 'not a number') is job)
+
+    def test_resubmit(self):
+        session = self.session()
+
+        def count(cancel):
+            while not cancel.wait(0.01):
+                pass
+            return 'stopped'
+
+        job = session.submit('count', count)
+        while job.status != RUNNING:
+            pass
+        new_job = session.submit('count', count, resubmit=True)
+        assertTrue('Resubmit starts a new job', new_job is not job)
+        assertEqual('Previous run is cancelled', CANCELLED, job.status)
+        assertTrue('Page keeps the new job', session.active_page.jobs['count'] is new_job)
+
+        assertTrue('Cancel running job', session.cancel('count'))
+        assertEqual('Cancelled job stops', 'stopped', new_job.result(5))
+        assertEqual('Cancelled job polled as cancelled', {'count': CANCELLED}, session.poll())
+        assertTrue('Cancelled job is submitted again', session.submit('count', count) is not new_job)
+        session.cancel('count')
+
 
 if __name__=='__main__':
     st.session_state.clear()
@@ -138,6 +226,8 @@ if __name__=='__main__':
     test_Session.run_tests()
     test_page = TestPage()
     test_page.run_tests()
+    TestSnapshot().run_tests()
+    TestJobs().run_tests()
 
     st.success('Tests finished')
         
\ No newline at end of file
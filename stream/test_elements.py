@@ -1 +1,65 @@
-from .core import Element
\ No newline at end of file
+from stream.elements import BokehPlot
+from stream.test_core import TestCase, assertEqual, assertTrue
+import numpy as np
+import pandas as pd
+import streamlit as st
+from bokeh.document import Document
+from bokeh.document.events import ColumnDataChangedEvent, ColumnsPatchedEvent, ColumnsStreamedEvent
+
+
+class TestBokehPlot(TestCase):
+
+    def frame(self, n):
+        return pd.DataFrame({'a': np.arange(n, dtype=float), 'b': np.ones(n)})
+
+    def plot(self, data, **kwargs):
+        plot = BokehPlot(data, **kwargs)
+        doc = Document()
+        doc.add_root(plot.data)
+        events = []
+        doc.on_change(lambda event: events.append(event))
+        return plot, events
+
+    def test_update_patch(self):
+        data = self.frame(5)
+        plot, events = self.plot(data)
+        changed = data.copy()
+        changed.loc[3, 'a'] = -1.0
+        plot.update(changed)
+        assertEqual('One patch sent', [ColumnsPatchedEvent], [type(e) for e in events])
+        assertEqual('Only the changed column is patched', ['a'], list(events[0].patches))
+        assertEqual('Source holds the new value', -1.0, plot.data.data['a'][3])
+        assertEqual('Source keeps its length', 5, len(plot.data.data['a']))
+
+    def test_update_stream(self):
+        plot, events = self.plot(self.frame(5))
+        plot.update(self.frame(8))
+        assertEqual('Only appended rows are streamed', [ColumnsStreamedEvent], [type(e) for e in events])
+        assertEqual('Streamed rows', [5.0, 6.0, 7.0], list(events[0].data['a']))
+        assertEqual('Source holds every row', 8, len(plot.data.data['a']))
+
+    def test_update_unchanged(self):
+        data = self.frame(5)
+        plot, events = self.plot(data)
+        plot.update(data.copy())
+        assertTrue('Nothing sent for equal data', not events)
+
+    def test_update_replace(self):
+        plot, events = self.plot(self.frame(5))
+        plot.update(self.frame(3))
+        assertEqual('Fewer rows replace the data', [ColumnDataChangedEvent], [type(e) for e in events])
+        assertEqual('Source holds the new rows', 3, len(plot.data.data['a']))
+
+    def test_append_rollover(self):
+        plot, events = self.plot(self.frame(5), rollover=6)
+        plot.append(self.frame(3).set_axis([5, 6, 7]))
+        assertEqual('Appended rows are streamed', [ColumnsStreamedEvent], [type(e) for e in events])
+        assertEqual('Source keeps the rollover rows', [2, 3, 4, 5, 6, 7], list(plot.data.data['index']))
+
+
+if __name__=='__main__':
+    st.session_state.clear()
+    st.header('Stream Elements Tests')
+    TestBokehPlot().run_tests()
+
+    st.success('Tests finished')